@@ -0,0 +1,218 @@
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from contextlib import contextmanager, nullcontext
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from utils import worker_pool, write_normalized_entry, minify_html, minify_css, deflated_size
+
+
+LOGGER = logging.getLogger()
+
+# minify function by extension of the zip entries
+MINIFIERS = {".html": minify_html, ".css": minify_css}
+
+
+def assemble_zip(filepath, entries, images, minify=False, text_compresslevel=None):
+    """
+    Write the HTML5 zip with the text entries [(path, content)] and the staged images
+    [(path, staged filepath)], sorted by path and written once with the fixed
+    timestamp and compression of write_normalized_entry. Return the compressed size
+    of the html, css and js files without and with minify and text_compresslevel
+    (0, size if none of them is used) and the seconds it took.
+    The zip is written with zipfile (like ricecooker's HTMLWriter, the first entry
+    of a path wins), importing ricecooker in a worker removes the chef's temp directory.
+    """
+    if "index.html" not in dict(entries):
+        raise ReferenceError("Invalid Zip at {}: missing index.html file".format(filepath))
+    started_at = time.time()
+    optimized = minify or text_compresslevel is not None
+    contents = {}
+    for path, content in entries:
+        contents.setdefault(path, content)
+    staged = {}
+    for path, staged_filepath in images:
+        if path not in contents:
+            staged.setdefault(path, staged_filepath)
+    baseline_size = 0
+    text_size = 0
+    tmp_filepath = "{}.assembling".format(filepath)
+    try:
+        with zipfile.ZipFile(tmp_filepath, "w") as zf:
+            for path in sorted(set(contents) | set(staged)):
+                if path in contents:
+                    content = contents[path]
+                    if optimized:
+                        baseline_size += deflated_size(content)
+                    minifier = MINIFIERS.get(os.path.splitext(path)[1])
+                    if minify and minifier is not None:
+                        content = minifier(content)
+                else:
+                    with open(staged[path], "rb") as f:
+                        content = f.read()
+                text_size += write_normalized_entry(zf, path, content,
+                    text_compresslevel=text_compresslevel)
+        os.replace(tmp_filepath, filepath)
+    finally:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+    return baseline_size, text_size, time.time() - started_at
+
+
+class ZipAssembler(object):
+    """
+    Assemble the HTML5 zips in a pool of processes, so the deflate and the minify
+    of a lesson run while the next one is downloaded. With max_workers=0 the zips
+    are assembled in the calling thread. submit blocks while max_pending zips
+    are waiting, their contents are kept in memory until they are written.
+    The images are staged in a directory of the run under staging_root, a staged
+    image is removed when the zips submitted with it are assembled and the
+    directory is removed by close(). The assembly time of every zip is added to
+    the "zip" stage of the profiler.
+    """
+    def __init__(self, max_workers=2, minify=False, text_compresslevel=None, max_pending=None,
+            staging_root=None, profiler=None):
+        self.max_workers = max_workers
+        self.minify = minify
+        self.text_compresslevel = text_compresslevel
+        self.max_pending = max_pending or max(max_workers, 1) * 4
+        self.staging_root = staging_root
+        self.profiler = profiler
+        self.staging_dir = None
+        self.pool = None
+        self.jobs = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        # staged filepath -> number of zips that use it and are not assembled yet
+        self.staged = {}
+
+    @contextmanager
+    def collect(self):
+        """
+        Yield a dict that gets the futures (by filepath) of the zips submitted in the block
+        """
+        futures = {}
+        self.collectors.append(futures)
+        try:
+            yield futures
+        finally:
+            self.collectors.remove(futures)
+
+    def profile_stage(self, name):
+        """
+        Profiler stage of the zips assembled in the calling thread
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.stage(name)
+
+    def staged_filepath(self, url):
+        """
+        Path of the staged file of the url in the staging directory of the run
+        """
+        if self.staging_dir is None:
+            if self.staging_root is not None:
+                os.makedirs(self.staging_root, exist_ok=True)
+            self.staging_dir = tempfile.mkdtemp(prefix="run-", dir=self.staging_root)
+        return os.path.join(self.staging_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def stage(self, url, read):
+        """
+        Return the staged filepath of the url, its content is read with read() if
+        it's not staged. The file is kept until the zip submitted with it is assembled.
+        """
+        filepath = self.staged_filepath(url)
+        with self.lock:
+            self.staged[filepath] = self.staged.get(filepath, 0) + 1
+            staged = os.path.exists(filepath)
+        if not staged:
+            try:
+                content = read()
+                with open("{}.tmp".format(filepath), "wb") as f:
+                    f.write(content)
+                os.replace("{}.tmp".format(filepath), filepath)
+            except BaseException:
+                self.release([filepath])
+                raise
+        return filepath
+
+    def release(self, filepaths):
+        """
+        Remove the staged files that are not used by any other zip
+        """
+        with self.lock:
+            for filepath in filepaths:
+                self.staged[filepath] = self.staged.get(filepath, 1) - 1
+                if self.staged[filepath] <= 0:
+                    del self.staged[filepath]
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+
+    def submit(self, filepath, entries, images, name=None):
+        """
+        Schedule the assembly of the zip in filepath, the zip replaces the
+        previous one only when it's complete
+        """
+        if self.max_workers == 0:
+            future = Future()
+            try:
+                with self.profile_stage("zip"):
+                    future.set_result(assemble_zip(filepath, entries, images,
+                        minify=self.minify, text_compresslevel=self.text_compresslevel))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            if self.pool is None:
+                self.pool = worker_pool(self.max_workers)
+            while self.pending() >= self.max_pending:
+                wait([future for future in self.jobs.values() if not future.done()],
+                    return_when=FIRST_COMPLETED)
+            future = self.pool.submit(assemble_zip, filepath, entries, images,
+                minify=self.minify, text_compresslevel=self.text_compresslevel)
+        future.add_done_callback(lambda future: self.log_sizes(future, name or filepath))
+        future.add_done_callback(lambda future: self.release(
+            [staged_filepath for _, staged_filepath in images]))
+        self.jobs[filepath] = future
+        for futures in self.collectors:
+            futures[filepath] = future
+        return future
+
+    def log_sizes(self, future, name):
+        if future.cancelled() or future.exception() is not None:
+            return
+        baseline_size, text_size, seconds = future.result()
+        if self.profiler is not None:
+            self.profiler.add_time("zip", seconds)
+        if baseline_size > 0:
+            LOGGER.info("   - HTML5 zip {}: html/css/js {} -> {} bytes compressed ({:.1f}% saved)".format(
+                name, baseline_size, text_size, 100. * (baseline_size - text_size) / baseline_size))
+
+    def pending(self):
+        return sum(1 for future in self.jobs.values() if not future.done())
+
+    def wait(self):
+        """
+        Wait for the zips and return the set of the filepaths that failed
+        """
+        failed = set([])
+        for filepath, future in self.jobs.items():
+            try:
+                future.result()
+            except Exception as e:
+                LOGGER.info("HTML5 zip error {}: {}".format(filepath, e))
+                failed.add(filepath)
+        self.jobs = {}
+        return failed
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.staging_dir is not None:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            self.staging_dir = None
+            self.staged = {}
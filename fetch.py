@@ -0,0 +1,220 @@
+import asyncio
+from collections import OrderedDict
+import io
+import logging
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+LOGGER = logging.getLogger()
+
+
+class FetchResponse(object):
+    def __init__(self, url, status_code, headers, content, reason=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.reason = reason
+
+
+class SessionFetcher(object):
+    """
+    Fetch the resources with a blocking requests session, the session's
+    cache adapters keep the responses in the web cache. The session is
+    built by get_session the first time it's used.
+    """
+    def __init__(self, get_session):
+        self.get_session = get_session
+
+    @property
+    def session(self):
+        return self.get_session()
+
+    def get(self, url, cache=True):
+        # cache=False skips the web cache adapters of the session
+        response = self.session.get(url) if cache else requests.get(url)
+        response.raise_for_status()
+        return FetchResponse(response.url, response.status_code, response.headers,
+            response.content, reason=response.reason)
+
+    def read(self, url, cache=True):
+        from ricecooker.utils import downloader
+        if not cache:
+            return downloader.read(url, loadjs=False)
+        return downloader.read(url, loadjs=False, session=self.session)
+
+    def prefetch(self, urls):
+        pass
+
+    def in_flight(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class AsyncFetcher(object):
+    """
+    Fetch the resources with aiohttp from an event loop running in its own thread.
+
+    get and read block like SessionFetcher's, prefetch schedules the urls to be
+    downloaded concurrently, the prefetched responses are kept in memory until
+    they are read, the oldest ones are dropped when they are more than
+    max_buffer bytes. The responses are cached with the CacheControl adapter that the
+    session of get_session mounts for the url (its heuristic, controller and
+    serializer), so both fetchers share the same web cache entries. The cache writes
+    run in the loop's executor, so they don't stall the requests in flight.
+    """
+    # aiohttp decodes the content, the cached responses are saved without these headers
+    DECODED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+    def __init__(self, get_session, concurrency=50, timeout=60, max_buffer=256*1024**2):
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError("The async engine needs aiohttp: pip install aiohttp")
+        self.aiohttp = aiohttp
+        self.get_session = get_session
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_buffer = max_buffer
+        self.buffer = OrderedDict()
+        self.buffer_size = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.run(self._open())
+
+    async def _open(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = self.aiohttp.ClientSession(
+            timeout=self.aiohttp.ClientTimeout(total=self.timeout))
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def cache_adapter(self, url):
+        """
+        Return the (request, adapter) to cache the url, or (None, None) if it's not cached
+        """
+        session = self.get_session()
+        adapter = session.get_adapter(url)
+        if getattr(adapter, "controller", None) is None:
+            return None, None
+        return session.prepare_request(requests.Request("GET", url)), adapter
+
+    def in_cache(self, url):
+        """
+        Return True if the url has an entry in the web cache, without reading it
+        """
+        request, adapter = self.cache_adapter(url)
+        if adapter is None:
+            return False
+        cache = adapter.controller.cache
+        key = adapter.controller.cache_url(request.url)
+        if hasattr(cache, "has"):
+            return cache.has(key)
+        return cache.get(key) is not None
+
+    def from_cache(self, url):
+        request, adapter = self.cache_adapter(url)
+        if adapter is None:
+            return None
+        cached = adapter.controller.cached_request(request)
+        if not cached:
+            return None
+        return FetchResponse(url, cached.status, cached.headers, cached.read(decode_content=True),
+            reason=cached.reason)
+
+    def to_cache(self, url, response):
+        from urllib3 import HTTPResponse
+        request, adapter = self.cache_adapter(url)
+        if adapter is None:
+            return
+        headers = {name: value for name, value in response.headers.items()
+            if name.lower() not in self.DECODED_HEADERS}
+        raw = HTTPResponse(body=io.BytesIO(response.content), headers=headers,
+            status=response.status_code, version=11, reason=response.reason,
+            preload_content=False, decode_content=False, request_method="GET")
+        if adapter.heuristic:
+            raw = adapter.heuristic.apply(raw)
+        adapter.controller.cache_response(request, raw, body=response.content)
+
+    async def _fetch(self, url):
+        async with self.semaphore:
+            try:
+                async with self.session.get(url) as response:
+                    content = await response.read()
+                    if response.status >= 400:
+                        raise requests.exceptions.HTTPError(
+                            "{} Error: {} for url: {}".format(response.status, response.reason, url))
+                    return FetchResponse(str(response.url), response.status,
+                        response.headers, content, reason=response.reason)
+            except self.aiohttp.TooManyRedirects as e:
+                raise requests.exceptions.TooManyRedirects(str(e))
+            except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise requests.exceptions.ConnectionError(str(e) or repr(e))
+
+    async def _prefetch(self, url):
+        try:
+            response = await self._fetch(url)
+        except requests.exceptions.RequestException as e:
+            LOGGER.debug("Prefetch error: {}".format(e))
+            return
+        with self.lock:
+            self.buffer[url] = response
+            self.buffer_size += len(response.content)
+            while self.buffer_size > self.max_buffer and len(self.buffer) > 1:
+                _, dropped = self.buffer.popitem(last=False)
+                self.buffer_size -= len(dropped.content)
+        await self.loop.run_in_executor(None, self.to_cache, url, response)
+
+    def prefetch(self, urls):
+        for url in urls:
+            with self.lock:
+                if url in self.pending or url in self.buffer:
+                    continue
+            if self.in_cache(url):
+                continue
+            future = asyncio.run_coroutine_threadsafe(self._prefetch(url), self.loop)
+            with self.lock:
+                self.pending[url] = future
+            future.add_done_callback(lambda _, url=url: self._done(url))
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def _done(self, url):
+        with self.lock:
+            self.pending.pop(url, None)
+
+    def get(self, url, cache=True):
+        with self.lock:
+            future = self.pending.get(url)
+        if future is not None:
+            future.result()
+        with self.lock:
+            response = self.buffer.pop(url, None)
+            if response is not None:
+                self.buffer_size -= len(response.content)
+        if response is None and cache:
+            response = self.from_cache(url)
+        if response is None:
+            response = self.run(self._fetch(url))
+            if cache:
+                self.to_cache(url, response)
+        return response
+
+    def read(self, url, cache=True):
+        return self.get(url, cache=cache).content
+
+    def close(self):
+        self.run(self.session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
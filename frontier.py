@@ -0,0 +1,181 @@
+from contextlib import contextmanager
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+#The lower values are claimed first
+PRIORITIES = {
+    "listing": 0,
+    "lesson": 1,
+    "section": 2,
+    "pdf": 3,
+    "image": 4,
+    "video": 5,
+}
+
+
+class Frontier(object):
+    """
+    Queue of the urls discovered by the chef saved in a SQLite database, every
+    url is saved once by kind with its state (pending, in_progress, done or failed).
+    The workers of several processes can claim the pending urls, a claimed url
+    that is not done after `lease` seconds can be claimed again, so a crashed
+    worker doesn't lose its work. The urls claimed by a dead process of the same
+    host can be claimed again right away.
+    """
+    def __init__(self, path, lease=3600):
+        self.path = path
+        self.lease = lease
+        self.host = socket.gethostname()
+        self.worker = "{}-{}".format(self.host, os.getpid())
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None,
+            check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS frontier (
+            url TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            data TEXT,
+            result TEXT,
+            worker TEXT,
+            claimed_at REAL,
+            updated_at REAL,
+            PRIMARY KEY (url, kind))""")
+        self.conn.execute("""CREATE INDEX IF NOT EXISTS frontier_queue
+            ON frontier (state, priority)""")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def add(self, url, kind, data=None, state=PENDING):
+        self.add_many([(url, data)], kind, state=state)
+
+    def add_many(self, items, kind, state=PENDING):
+        """
+        Add the (url, data) items that are not in the frontier yet
+        """
+        now = time.time()
+        priority = PRIORITIES.get(kind, len(PRIORITIES))
+        rows = [(url, kind, priority, state, json.dumps(data), now) for url, data in items]
+        with self.transaction() as conn:
+            conn.executemany("""INSERT OR IGNORE INTO frontier
+                (url, kind, priority, state, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)""", rows)
+
+    def claim(self, kinds=None):
+        """
+        Return the next pending url as a dict with its url, kind and data,
+        or None if there is not any url to claim
+        """
+        now = time.time()
+        query = """SELECT rowid, url, kind, data FROM frontier
+            WHERE (state = ? OR (state = ? AND claimed_at < ?))"""
+        params = [PENDING, IN_PROGRESS, now - self.lease]
+        if kinds:
+            query += " AND kind IN ({})".format(",".join("?" * len(kinds)))
+            params.extend(kinds)
+        query += " ORDER BY priority, rowid LIMIT 1"
+        with self.transaction() as conn:
+            self.release_dead_workers(conn)
+            row = conn.execute(query, params).fetchone()
+            if row is not None:
+                conn.execute("""UPDATE frontier SET state = ?, worker = ?,
+                    claimed_at = ?, updated_at = ? WHERE rowid = ?""",
+                    (IN_PROGRESS, self.worker, now, now, row[0]))
+        if row is not None:
+            return dict(url=row[1], kind=row[2], data=json.loads(row[3]))
+
+    def release_dead_workers(self, conn):
+        """
+        Set back to pending the urls claimed by the processes of this host that are not running
+        """
+        rows = conn.execute("SELECT DISTINCT worker FROM frontier WHERE state = ? AND worker LIKE ?",
+            (IN_PROGRESS, "{}-%".format(self.host))).fetchall()
+        for worker, in rows:
+            pid = worker[len(self.host) + 1:]
+            if pid.isdigit() and not is_running(int(pid)):
+                conn.execute("""UPDATE frontier SET state = ?, worker = NULL, updated_at = ?
+                    WHERE state = ? AND worker = ?""", (PENDING, time.time(), IN_PROGRESS, worker))
+
+    def pending(self, kind):
+        """
+        Number of urls of the kind that are not done or failed
+        """
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM frontier WHERE kind = ? AND state IN (?, ?)",
+                (kind, PENDING, IN_PROGRESS)).fetchone()[0]
+
+    def done(self, url, kind, result=None):
+        self.set_state(url, kind, DONE, result=result)
+
+    def fail(self, url, kind, error=None):
+        self.set_state(url, kind, FAILED, result=error)
+
+    def set_state(self, url, kind, state, result=None):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("""INSERT OR IGNORE INTO frontier
+                (url, kind, priority, state, updated_at) VALUES (?, ?, ?, ?, ?)""",
+                (url, kind, PRIORITIES.get(kind, len(PRIORITIES)), state, now))
+            # a url set again to the same state without a result keeps its saved result
+            value = json.dumps(result) if result is not None else None
+            conn.execute("""UPDATE frontier SET result = CASE WHEN ? IS NULL AND state = ?
+                THEN result ELSE ? END, state = ?, updated_at = ? WHERE url = ? AND kind = ?""",
+                (value, state, value, state, now, url, kind))
+
+    def results(self, kind):
+        with self.lock:
+            rows = self.conn.execute("SELECT url, result FROM frontier WHERE kind = ? AND state = ?",
+                (kind, DONE)).fetchall()
+        return {url: json.loads(result) for url, result in rows}
+
+    def result(self, url, kind):
+        """
+        Return the result of the url if it's done, None otherwise
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT result FROM frontier WHERE url = ? AND kind = ? AND state = ?",
+                (url, kind, DONE)).fetchone()
+        if row is not None and row[0] is not None:
+            return json.loads(row[0])
+
+    def counts(self):
+        """
+        Return the number of urls by kind and state, e.g {("listing", "done"): 10}
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, state, COUNT(*) FROM frontier GROUP BY kind, state").fetchall()
+        return {(kind, state): total for kind, state, total in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,125 @@
+import copy
+import sys
+
+from le_utils.constants import content_kinds
+
+
+_LICENSES = {}
+
+
+def shared_license(license_id, copyright_holder=None):
+    """
+    Return the license dict, the same dict is shared by all the nodes with the same license
+    """
+    key = (license_id, copyright_holder)
+    if key not in _LICENSES:
+        from ricecooker.classes.licenses import get_license
+        _LICENSES[key] = get_license(license_id, copyright_holder=copyright_holder).as_dict()
+    return _LICENSES[key]
+
+
+def to_dict(value):
+    """
+    Convert the nodes of a tree (or a list of nodes) to the ricecooker json tree dicts
+    """
+    if isinstance(value, Node):
+        return value.to_dict()
+    elif isinstance(value, dict):
+        return {key: to_dict(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [to_dict(item) for item in value]
+    return value
+
+
+class Node(object):
+    """
+    Base class of the channel tree nodes. The fields are kept in __slots__, the
+    license and the language are shared between nodes, and they are read and
+    written like the ricecooker dicts, e.g node["source_id"], "children" in node.
+    """
+    kind = None
+    # the fields in the same order of the json tree dicts
+    FIELDS = ("kind", "source_id", "title", "description", "license", "language")
+    SHARED_FIELDS = ("kind", "license", "language")
+    __slots__ = ("source_id", "title", "description", "license", "language")
+
+    def __init__(self, source_id=None, title=None, description="", license=None, language=None):
+        self.source_id = source_id
+        self.title = title
+        self.description = description
+        self.license = license
+        self.language = sys.intern(language) if language is not None else None
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS or key == "kind":
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __deepcopy__(self, memo):
+        node = object.__new__(type(self))
+        for field in self.FIELDS:
+            if field == "kind":
+                continue
+            value = getattr(self, field)
+            if field not in self.SHARED_FIELDS:
+                value = copy.deepcopy(value, memo)
+            setattr(node, field, value)
+        return node
+
+    def to_dict(self):
+        return {field: to_dict(getattr(self, field)) for field in self.FIELDS}
+
+
+class TopicNode(Node):
+    kind = content_kinds.TOPIC
+    FIELDS = Node.FIELDS + ("children",)
+    __slots__ = ("children",)
+
+    def __init__(self, children=None, **kwargs):
+        super(TopicNode, self).__init__(**kwargs)
+        self.children = children if children is not None else []
+
+
+class DocumentNode(Node):
+    kind = content_kinds.DOCUMENT
+    FIELDS = Node.FIELDS + ("files",)
+    __slots__ = ("files",)
+
+    def __init__(self, files=None, **kwargs):
+        super(DocumentNode, self).__init__(**kwargs)
+        self.files = files if files is not None else []
+
+
+class HTML5Node(Node):
+    kind = content_kinds.HTML5
+    FIELDS = Node.FIELDS + ("thumbnail", "author", "files")
+    __slots__ = ("thumbnail", "author", "files")
+
+    def __init__(self, files=None, thumbnail=None, author="", **kwargs):
+        super(HTML5Node, self).__init__(**kwargs)
+        self.thumbnail = thumbnail
+        self.author = author
+        self.files = files if files is not None else []
+
+
+class VideoNode(Node):
+    kind = content_kinds.VIDEO
+    FIELDS = Node.FIELDS + ("files",)
+    __slots__ = ("files",)
+
+    def __init__(self, files=None, **kwargs):
+        super(VideoNode, self).__init__(**kwargs)
+        self.files = files if files is not None else []
@@ -0,0 +1,197 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+
+
+LOGGER = logging.getLogger()
+
+
+class Profiler(object):
+    """
+    Sampling profiler of the stages of the run. While a thread is inside of
+    stage(name) its stack is sampled every interval seconds, a sample counts for
+    every stage the thread is in (e.g. the videos are part of the scrape too).
+    write() saves a speedscope file and the folded stacks (for flamegraph.pl) of
+    every stage and the top functions of all the stages in hotspots.txt.
+    The work of other processes can't be sampled, its time is added with
+    add_time(name, seconds) and saved in hotspots.txt too.
+    It does nothing until start() is called.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = None
+        self.interval = 0.01
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.samples = defaultdict(Counter)
+        self.frames = {}
+        self.timings = defaultdict(list)
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self, output_dir, interval=0.01):
+        self.enabled = True
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        LOGGER.info("Profiling every {:.0f} ms, the profiles are saved in {}".format(
+            interval * 1000, output_dir))
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.stages.setdefault(thread_id, []).append(name)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages[thread_id].pop()
+                if len(self.stages[thread_id]) == 0:
+                    del self.stages[thread_id]
+
+    def wrap(self, name):
+        """
+        Decorator to run every call of the function in the stage name
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.timings[name].append(seconds)
+
+    def timings_table(self):
+        lines = ["Timed stages (the work of other processes is not sampled)",
+            "{:>7} {:>9} {:>9}  {}".format("calls", "total s", "mean ms", "stage")]
+        for name, times in sorted(self.timings.items()):
+            lines.append("{:>7} {:>9.1f} {:>9.1f}  {}".format(len(times), sum(times),
+                1000. * sum(times) / len(times), name))
+        return "\n".join(lines)
+
+    def frame_key(self, frame):
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        if key not in self.frames:
+            self.frames[key] = len(self.frames)
+        return self.frames[key]
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            stages = {thread_id: set(names) for thread_id, names in self.stages.items()}
+        for thread_id, names in stages.items():
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self.frame_key(frame))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            for name in names:
+                self.samples[name][stack] += 1
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def frame_names(self):
+        names = [None] * len(self.frames)
+        for (name, filename, line), index in self.frames.items():
+            names[index] = (name, filename, line)
+        return names
+
+    def to_speedscope(self, name, stacks, frame_names):
+        samples = list(stacks.items())
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "tessindia-profiler",
+            "shared": {"frames": [dict(name=fn_name, file=filename, line=line)
+                for fn_name, filename, line in frame_names]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(count for _, count in samples) * self.interval,
+                "samples": [list(stack) for stack, _ in samples],
+                "weights": [count * self.interval for _, count in samples],
+            }],
+        }
+
+    def to_folded(self, stacks, frame_names):
+        lines = []
+        for stack, count in stacks.most_common():
+            names = ["{} ({}:{})".format(frame_names[index][0],
+                os.path.basename(frame_names[index][1]), frame_names[index][2]) for index in stack]
+            lines.append("{} {}".format(";".join(names), count))
+        return "\n".join(lines) + "\n"
+
+    def hotspots(self, name, stacks, frame_names, top=25):
+        """
+        Table of the functions with more samples: the own samples (self) and the samples
+        with the function in the stack (total)
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks.items():
+            if len(stack) > 0:
+                own[stack[-1]] += count
+            for index in set(stack):
+                total[index] += count
+        samples = sum(stacks.values())
+        lines = ["Stage {}: {} samples, {:.1f} s".format(name, samples, samples * self.interval),
+            "{:>7} {:>7}  {}".format("self%", "total%", "function")]
+        for index, count in own.most_common(top):
+            fn_name, filename, line = frame_names[index]
+            lines.append("{:>6.1f}% {:>6.1f}%  {} ({}:{})".format(100. * count / samples,
+                100. * total[index] / samples, fn_name, filename, line))
+        return "\n".join(lines)
+
+    def write(self, top=25):
+        if not self.output_dir:
+            return
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        frame_names = self.frame_names()
+        tables = []
+        for name, stacks in sorted(self.samples.items()):
+            with open(os.path.join(self.output_dir, "{}.speedscope.json".format(name)), "w") as f:
+                json.dump(self.to_speedscope(name, stacks, frame_names), f)
+            with open(os.path.join(self.output_dir, "{}.folded".format(name)), "w") as f:
+                f.write(self.to_folded(stacks, frame_names))
+            tables.append(self.hotspots(name, stacks, frame_names, top=top))
+        if self.timings:
+            tables.append(self.timings_table())
+        with open(os.path.join(self.output_dir, "hotspots.txt"), "w") as f:
+            f.write("\n\n".join(tables) + "\n")
+        LOGGER.info("Profiles of {} saved in {}".format(
+            ", ".join(sorted(set(self.samples) | set(self.timings))), self.output_dir))
+
+    def stop(self):
+        """
+        Stop the sampling and write the profiles
+        """
+        if not self.enabled:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.enabled = False
+        self.write()
@@ -0,0 +1,177 @@
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import sys
+import threading
+import time
+
+
+LOGGER = logging.getLogger()
+
+KINDS = ("listing", "lesson", "section", "pdf", "image", "video")
+
+
+class Progress(object):
+    """
+    Progress of the run: the urls discovered and done by kind, the downloaded bytes,
+    the rates of the last `window` seconds, the depth of the queues of every stage
+    and the ETA of the listings. It's served in the Prometheus text format by
+    serve(port) and printed as a status line by show_status(interval).
+    """
+    def __init__(self, window=600):
+        self.window = window
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.total = defaultdict(set)
+        self.done = defaultdict(set)
+        self.events = defaultdict(deque)
+        self.bytes = 0
+        self.bytes_events = deque()
+        self.queues = {}
+        self.server = None
+        self.stop_event = threading.Event()
+
+    def discovered(self, kind, urls):
+        with self.lock:
+            self.total[kind].update(urls)
+
+    def finished(self, kind, url):
+        now = time.time()
+        with self.lock:
+            self.total[kind].add(url)
+            if url not in self.done[kind]:
+                self.done[kind].add(url)
+                self.events[kind].append(now)
+
+    def downloaded(self, size):
+        with self.lock:
+            self.bytes += size
+            self.bytes_events.append((time.time(), size))
+
+    def add_queue(self, stage, depth):
+        """
+        Add a stage queue, depth is a function that returns the items waiting in it
+        """
+        self.queues[stage] = depth
+
+    def elapsed(self, now):
+        return max(min(now - self.started_at, self.window), 1)
+
+    def expire(self, now):
+        for events in self.events.values():
+            while events and events[0] < now - self.window:
+                events.popleft()
+        while self.bytes_events and self.bytes_events[0][0] < now - self.window:
+            self.bytes_events.popleft()
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            self.expire(now)
+            elapsed = self.elapsed(now)
+            counts = {kind: (len(self.done[kind]), len(self.total[kind])) for kind in KINDS}
+            rates = {kind: len(self.events[kind]) / elapsed for kind in KINDS}
+            bytes_rate = sum(size for _, size in self.bytes_events) / elapsed
+            total_bytes = self.bytes
+        queues = {}
+        for stage, depth in self.queues.items():
+            try:
+                queues[stage] = depth()
+            except Exception:
+                queues[stage] = 0
+        done, total = counts["listing"]
+        eta = None
+        if rates["listing"] > 0:
+            eta = (total - done) / rates["listing"]
+        return dict(counts=counts, rates=rates, bytes=total_bytes, bytes_rate=bytes_rate,
+            queues=queues, eta=eta, elapsed=now - self.started_at)
+
+    def metrics(self):
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP tessindia_items_done Items scraped by kind.",
+            "# TYPE tessindia_items_done gauge",
+        ]
+        lines += ['tessindia_items_done{{kind="{}"}} {}'.format(kind, done)
+            for kind, (done, _) in snapshot["counts"].items()]
+        lines += ["# HELP tessindia_items_total Items discovered by kind.",
+            "# TYPE tessindia_items_total gauge"]
+        lines += ['tessindia_items_total{{kind="{}"}} {}'.format(kind, total)
+            for kind, (_, total) in snapshot["counts"].items()]
+        lines += ["# HELP tessindia_items_rate Items scraped per second by kind.",
+            "# TYPE tessindia_items_rate gauge"]
+        lines += ['tessindia_items_rate{{kind="{}"}} {:.4f}'.format(kind, rate)
+            for kind, rate in snapshot["rates"].items()]
+        lines += ["# HELP tessindia_downloaded_bytes Bytes downloaded.",
+            "# TYPE tessindia_downloaded_bytes counter",
+            "tessindia_downloaded_bytes {}".format(snapshot["bytes"]),
+            "# HELP tessindia_downloaded_bytes_rate Bytes downloaded per second.",
+            "# TYPE tessindia_downloaded_bytes_rate gauge",
+            "tessindia_downloaded_bytes_rate {:.1f}".format(snapshot["bytes_rate"]),
+            "# HELP tessindia_queue_depth Items waiting by stage.",
+            "# TYPE tessindia_queue_depth gauge"]
+        lines += ['tessindia_queue_depth{{stage="{}"}} {}'.format(stage, depth)
+            for stage, depth in snapshot["queues"].items()]
+        lines += ["# HELP tessindia_eta_seconds Estimated seconds to scrape the pending listings.",
+            "# TYPE tessindia_eta_seconds gauge",
+            "tessindia_eta_seconds {}".format(
+                -1 if snapshot["eta"] is None else int(snapshot["eta"]))]
+        return "\n".join(lines) + "\n"
+
+    def status_line(self):
+        snapshot = self.snapshot()
+        items = ["{} {}/{}".format(kind, done, total)
+            for kind, (done, total) in snapshot["counts"].items() if total > 0]
+        items.append("{:.1f} MB ({:.1f} KB/s)".format(snapshot["bytes"] / 1024**2,
+            snapshot["bytes_rate"] / 1024))
+        items += ["{} queue {}".format(stage, depth) for stage, depth in snapshot["queues"].items()]
+        if snapshot["eta"] is not None:
+            items.append("ETA {}".format(format_seconds(snapshot["eta"])))
+        return " | ".join(items)
+
+    def serve(self, port, host="127.0.0.1"):
+        progress = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = progress.metrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        LOGGER.info("Progress metrics on http://{}:{}/metrics".format(host, port))
+
+    def show_status(self, interval=5, stream=None):
+        """
+        Print the status line every interval seconds, it's rewritten in place on a terminal
+        """
+        stream = stream or sys.stderr
+
+        def run():
+            while not self.stop_event.wait(interval):
+                if stream.isatty():
+                    stream.write("\r\033[K" + self.status_line())
+                    stream.flush()
+                else:
+                    LOGGER.info(self.status_line())
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
@@ -0,0 +1,140 @@
+from http import client
+import glob
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from fetch import FetchResponse
+
+
+LOGGER = logging.getLogger()
+
+# the recorded payloads are already decoded, these headers don't apply to them
+SKIP_HEADERS = set(["content-encoding", "transfer-encoding", "content-length"])
+
+
+def import_warcio():
+    try:
+        import warcio
+    except ImportError:
+        raise RuntimeError("The snapshot mode needs warcio: pip install warcio")
+    return warcio
+
+
+class RecordingFetcher(object):
+    """
+    Fetch the resources with another fetcher and record every response in
+    a WARC file of the snapshot directory
+    """
+    def __init__(self, fetcher, directory):
+        import_warcio()
+        from warcio.warcwriter import WARCWriter
+        self.fetcher = fetcher
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.filepath = os.path.join(directory, "tessindia-{}-{}.warc.gz".format(
+            time.strftime("%Y%m%d%H%M%S"), os.getpid()))
+        self.file = open(self.filepath, "wb")
+        self.writer = WARCWriter(self.file, gzip=True)
+        self.recorded = set([])
+        self.lock = threading.Lock()
+        LOGGER.info("Recording the snapshot in {}".format(self.filepath))
+
+    def record(self, url, response):
+        from warcio.statusandheaders import StatusAndHeaders
+        headers = [(name, value) for name, value in response.headers.items()
+            if name.lower() not in SKIP_HEADERS]
+        status = "{} {}".format(response.status_code, client.responses.get(response.status_code, ""))
+        http_headers = StatusAndHeaders(status.strip(), headers, protocol="HTTP/1.1")
+        with self.lock:
+            if url in self.recorded:
+                return
+            record = self.writer.create_warc_record(url, "response",
+                payload=io.BytesIO(response.content), http_headers=http_headers)
+            self.writer.write_record(record)
+            self.recorded.add(url)
+
+    def get(self, url, cache=True):
+        response = self.fetcher.get(url, cache=cache)
+        self.record(url, response)
+        return response
+
+    def read(self, url, cache=True):
+        return self.get(url, cache=cache).content
+
+    def prefetch(self, urls):
+        self.fetcher.prefetch(urls)
+
+    def in_flight(self):
+        return self.fetcher.in_flight()
+
+    def close(self):
+        self.fetcher.close()
+        with self.lock:
+            self.file.close()
+
+
+class ReplayFetcher(object):
+    """
+    Serve the resources from the WARC files of the snapshot directory without
+    network, the urls that are not in the snapshot raise a 404 HTTPError.
+    The offsets of the records are saved next to every WARC file (.idx.json).
+    """
+    def __init__(self, directory):
+        import_warcio()
+        self.index = {}
+        filepaths = sorted(glob.glob(os.path.join(directory, "*.warc.gz")))
+        for filepath in filepaths:
+            # the newer files are loaded later and replace the older records
+            for url, offset in self.load_index(filepath).items():
+                self.index[url] = (filepath, offset)
+        LOGGER.info("Snapshot with {} urls in {} files".format(len(self.index), len(filepaths)))
+
+    def load_index(self, filepath):
+        from warcio.archiveiterator import ArchiveIterator
+        index_filepath = "{}.idx.json".format(filepath)
+        if os.path.exists(index_filepath) and \
+                os.path.getmtime(index_filepath) >= os.path.getmtime(filepath):
+            with open(index_filepath) as f:
+                return json.load(f)
+        index = {}
+        with open(filepath, "rb") as f:
+            records = ArchiveIterator(f)
+            for record in records:
+                if record.rec_type == "response":
+                    index[record.rec_headers.get_header("WARC-Target-URI")] = \
+                        records.get_record_offset()
+        with open(index_filepath, "w") as f:
+            json.dump(index, f)
+        return index
+
+    def get(self, url, cache=True):
+        from warcio.archiveiterator import ArchiveIterator
+        if url not in self.index:
+            raise requests.exceptions.HTTPError(
+                "404 Client Error: Not in the snapshot for url: {}".format(url))
+        filepath, offset = self.index[url]
+        with open(filepath, "rb") as f:
+            f.seek(offset)
+            record = next(iter(ArchiveIterator(f)))
+            content = record.content_stream().read()
+            status_code = int(record.http_headers.get_statuscode())
+            headers = record.http_headers.headers
+        return FetchResponse(url, status_code, headers, content)
+
+    def read(self, url, cache=True):
+        return self.get(url).content
+
+    def prefetch(self, urls):
+        pass
+
+    def in_flight(self):
+        return 0
+
+    def close(self):
+        pass
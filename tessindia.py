@@ -0,0 +1,1529 @@
+from collections import OrderedDict, defaultdict
+import copy
+from assemble import ZipAssembler
+from fetch import SessionFetcher, AsyncFetcher
+from frontier import Frontier
+from nodes import TopicNode, DocumentNode, HTML5Node, VideoNode, shared_license, to_dict
+from profiling import Profiler
+from progress import Progress
+from snapshot import RecordingFetcher, ReplayFetcher
+from transcode import Transcoder, has_ffmpeg
+from http import client
+import gettext
+import glob
+import hashlib
+import json
+from le_utils.constants import licenses, content_kinds, file_formats
+import logging
+import os
+from pathlib import Path
+import re
+import requests
+from ricecooker.chefs import JsonTreeChef
+from ricecooker.utils.jsontrees import write_tree_to_json_tree, SUBTITLES_FILE
+import sys
+import time
+from urllib.error import URLError
+from urllib.parse import urljoin, urlencode
+from utils import save_thumbnail, if_file_exists, load_tree
+from utils import if_dir_exists, get_name_from_url, get_name_from_url_no_ext
+from utils import build_path, remove_links, remove_iframes, check_shorter_url
+from utils import get_level_map, get_node_from_channel, split_option, LevelIndex
+from utils import replace_files_paths, remove_files_nodes, FailureCache
+import urllib.parse as urlparse
+
+
+# Additional Constants
+################################################################################
+LOGGER = logging.getLogger()
+__logging_handler = logging.StreamHandler()
+LOGGER.addHandler(__logging_handler)
+LOGGER.setLevel(logging.INFO)
+
+# BASE_URL is used to identify when a resource is owned by Edsitement
+BASE_URL = "http://www.tess-india.edu.in/learning-materials"
+
+# If False then no download is made
+# for debugging proporses
+DOWNLOAD_VIDEOS = True
+
+# minify=1 minifies the html and css of the HTML5 zips and zip_level=<0-9> sets
+# the deflate level of its html, css and js files
+MINIFY_HTML = False
+ZIP_TEXT_LEVEL = None
+
+# time.sleep for debugging proporses, it helps to check log messages
+TIME_SLEEP = .8
+
+DATA_DIR = "chefdata"
+COPYRIGHT_HOLDER = "The Open University"
+
+#Curricular units with its lessons
+CURRICULAR_UNITS_MAP = defaultdict(OrderedDict)
+#Lessons related with curricular units
+LESSONS_CURRICULAR_MAP = defaultdict(set)
+#Lessons nodes already scraped in this run (or saved in the frontier), by its normalized url
+LESSONS_REGISTRY = {}
+# webcache
+###############################################################
+# the session and its cache are built by get_session the first time they are used,
+# bs4, youtube_dl and ricecooker's html_writer are imported where they are needed,
+# so the worker processes and the short runs don't pay its import time
+sess = None
+cache = None
+WEBCACHE_DIR = '.webcache-lru'
+# the size budget of the web cache, set with cache_size=<MB> and cache_max_age=<days>
+CACHE_MAX_BYTES = 10 * 1024**3
+CACHE_MAX_AGE = None
+
+
+def get_session():
+    global sess, cache
+    if sess is None:
+        from ricecooker.utils.caching import CacheForeverHeuristic, CacheControlAdapter
+        from webcache import BoundedCache
+        cache = BoundedCache(WEBCACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+        basic_adapter = CacheControlAdapter(cache=cache)
+        forever_adapter = CacheControlAdapter(heuristic=CacheForeverHeuristic(), cache=cache)
+        sess = requests.Session()
+        sess.mount('http://', basic_adapter)
+        sess.mount(BASE_URL, forever_adapter)
+    return sess
+
+
+# every download is made through FETCHER, see TESSIndiaChef.setup_fetcher
+FETCHER = SessionFetcher(get_session)
+# the discovered urls are saved in FRONTIER when frontier=1 is used
+FRONTIER = None
+FRONTIER_PATH = os.path.join(DATA_DIR, "frontier.sqlite3")
+# WARC files of snapshot=record|replay
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshot")
+# counters of the scraped items, see TESSIndiaChef.setup_progress
+PROGRESS = Progress()
+# sampling profiler of the stages when profile=1 is used
+PROFILER = Profiler()
+PROFILES_DATA_DIR = os.path.join(DATA_DIR, "profiles")
+# the videos are re-encoded by TRANSCODER when transcode=<profile> is used
+TRANSCODER = None
+TRANSCODED_DATA_DIR = os.path.join(DATA_DIR, "transcoded")
+# the HTML5 zips are assembled by ZIP_ASSEMBLER from the html of the sections
+# and the images staged under STAGING_DATA_DIR, see TESSIndiaChef.setup_html5_zips
+STAGING_DATA_DIR = os.path.join(DATA_DIR, "staging")
+ZIP_ASSEMBLER = ZipAssembler(max_workers=0, staging_root=STAGING_DATA_DIR, profiler=PROFILER)
+# youtube urls that failed to download in previous runs
+VIDEO_FAILURES = FailureCache(os.path.join(DATA_DIR, "youtube_failures.json"))
+
+# Main Scraping Method
+################################################################################
+
+def test():
+    """
+    Test individual resources
+    """
+    url = "http://www.tess-india.edu.in/learning-materials?course_tid=136&subject_tid=181&educational_level_tid=226"
+    global channel_tree    
+    channel_tree = dict(
+        source_domain=TESSIndiaChef.HOSTNAME,
+        source_id='tessindia',
+        title='TESSIndia',
+        description="""TESS-India is led by The Open University and Save The Children India, funded by UK Aid it is a multilingual teacher professional development programme whose aim is to support India’s national educational policy by enhancing the classroom practice of primary and secondary school teachers through the provision of freely available, adaptable Open Educational Resources (OER)."""[:400], #400 UPPER LIMIT characters allowed 
+        thumbnail=None,
+        language="en",
+        children=[],
+        license=TESSIndiaChef.LICENSE,
+    )
+    try:
+        resource = Resource(source_id=url,
+            lang="en",
+            state="All India - English",
+            subject="English",
+            level="Elementary")
+        resource.scrape()
+        resource.to_tree(channel_tree, tree_index=LevelIndex(channel_tree))
+    except requests.exceptions.HTTPError as e:
+        LOGGER.info("Error: {}".format(e))
+    return channel_tree
+
+
+def test_lesson():
+    lesson_url = "http://www.tess-india.edu.in/learning-resource-1001"
+    lesson = Lesson(name="test", key_resource_id=lesson_url, lang="en",
+                    extra_resources=None, path=["A", "B"])
+    lesson.download()
+    lesson_node = lesson.to_node()
+    print(lesson_node)
+
+
+class ResourceBrowser(object):
+    def __init__(self, resource_url):
+        self.resource_url = resource_url
+
+    def build_url(self, course_tid=None, subject_tid=None, educational_level_tid=None):
+        if educational_level_tid is not None:
+            params = dict(course_tid=course_tid, subject_tid=subject_tid, 
+                        educational_level_tid=educational_level_tid)
+        else:
+            params = dict(course_tid=course_tid, subject_tid=subject_tid)
+        url_parts = list(urlparse.urlparse(self.resource_url))
+        query = dict(urlparse.parse_qsl(url_parts[4]))
+        query.update(params)
+        url_parts[4] = urlencode(query)
+        return urlparse.urlunparse(url_parts)
+
+    def get_total_items(self, text):
+        string = re.search(r"\d+\-\d+ of \d+", text).group()
+        return int(string.split("of")[-1].strip())
+
+    def run(self, limit_page=1, page_number=1):
+        from bs4 import BeautifulSoup
+        total_items = None
+        counter = 0
+        try:
+            page_contents = FETCHER.read(self.resource_url, cache=False)
+        except requests.exceptions.HTTPError as e:
+            LOGGER.info("Error: {}".format(e))
+        else:
+            page = BeautifulSoup(page_contents, 'html.parser')
+            states = page.find("div", class_=["lm-filter-course"])
+            states_tree = self.get_state_lang(states)
+            subjects = page.find("div", class_=["lm-filter-subject"])
+            subjects_tree = self.get_subjects(subjects)
+            levels = page.find("div", class_=["lm-filter-level"])
+            levels_tree = self.get_levels(levels)
+            pages_params = self.build_page_params(states_tree, subjects_tree, levels_tree)
+            for page_params in pages_params:
+                url = self.build_url(page_params["course_tid"], 
+                    page_params["subject_tid"], 
+                    page_params.get("educational_level_tid", None))
+                yield dict(url=url,
+                    subject_name=page_params["subject_name"],
+                    state_lang=page_params["state_lang"],
+                    level_name=page_params.get("level_name", None))
+                LOGGER.info("CRAWLING : URL {}".format(url))
+                time.sleep(TIME_SLEEP)
+
+    def get_state_lang(self, items):
+        tree = {}
+        for state_data in items.findAll("button"):
+            tree[state_data["data-tid"]] = state_data.text.strip()
+        return tree
+
+    def get_subjects(self, items):
+        tree = {}
+        for subject_data in items.findAll("button"):
+            if subject_data["data-course"] == "all":
+                continue
+            tree.setdefault(subject_data["data-course"], {})
+            tree[subject_data["data-course"]][subject_data["data-tid"]] = (subject_data.text.strip(), bool(int(subject_data.get("data-hide-level", "0"))))
+        return tree
+
+    def get_levels(self, items):
+        tree = {}
+        for subject_data in items.findAll("button"):
+            tree.setdefault(subject_data["data-course"], {})
+            tree[subject_data["data-course"]][subject_data["data-tid"]] = subject_data.text.strip()
+        return tree
+
+    def build_page_params(self, states, subjects, levels):
+        pages = []#course_tid, subject_tid, educational_level_tid
+        for course_tid in subjects:
+            for subjects_tid in subjects[course_tid]:
+                subject_name = subjects[course_tid][subjects_tid][0]
+                not_has_levels = subjects[course_tid][subjects_tid][1]
+                info = {"course_tid": course_tid, "subject_tid": subjects_tid,
+                    "state_lang": states[course_tid], "subject_name": subject_name}
+                if not_has_levels is False:
+                    for level_tid in levels[course_tid]:
+                        info_tmp = info.copy()
+                        info_tmp["educational_level_tid"] = level_tid
+                        info_tmp["level_name"] = levels[course_tid][level_tid]
+                        pages.append(info_tmp)
+                else:        
+                    pages.append(info)
+        return pages
+
+
+class Resource(object):
+    def __init__(self, source_id,  lang="en", state=None, subject=None, level=None,
+                lesson_urls=None):
+        self.source_id = source_id
+        self.lang = lang
+        self.state = state
+        self.subject = subject
+        self.level = level
+        # if it's set only these lessons (normalized urls) are scraped
+        self.lesson_urls = lesson_urls
+        self.nodes = []
+        self.ids = set([])
+
+    def scrape(self):
+        page = download(self.source_id)
+        for material in page.findAll("div", class_=["node-learning-material"]):
+            resource = material.find(lambda tag: tag.name == "a" and tag.findParent("h2"))
+            if resource is not None:
+                lesson_name = resource.text
+                lesson_url = resource["href"]
+            else:
+                lesson_name = material.find("h2").text
+                lesson_url = material.attrs.get("about", "")
+            extra_resources = material.findAll(lambda tag: tag.name == "a" and \
+                tag.findParent("div", class_=["lmat-download"]))
+            extra_resources_urls = set([])
+            for extra_resource in extra_resources:
+                extra_resources_urls.add(extra_resource["href"])
+            if self.lesson_urls and normalize_url(lesson_url) not in self.lesson_urls:
+                continue
+            if not lesson_url in self.ids:
+                discovered("lesson", [normalize_url(lesson_url)])
+                lesson_node = self.get_lesson_node(lesson_name, lesson_url, extra_resources_urls)
+                finished("lesson", normalize_url(lesson_url))
+                if len(lesson_node["children"]) > 0:
+                    self.nodes.append(lesson_node)
+                self.ids.add(lesson_url)
+
+    def get_lesson_node(self, lesson_name, lesson_url, extra_resources_urls):
+        """
+        The same lesson is listed under several subjects and levels, it's only
+        downloaded the first time and the later listings get a copy of its node
+        """
+        lesson_id = normalize_url(lesson_url)
+        # the lessons scraped by the other processes of the frontier are in its results,
+        # unless the lessons are filtered to scrape them again
+        if lesson_id not in LESSONS_REGISTRY and FRONTIER is not None and not self.lesson_urls:
+            lesson_node = FRONTIER.result(lesson_id, "lesson")
+            if lesson_node is not None:
+                LESSONS_REGISTRY[lesson_id] = lesson_node
+        if lesson_id in LESSONS_REGISTRY:
+            LOGGER.info("Already scraped: {}".format(lesson_id))
+            return copy.deepcopy(LESSONS_REGISTRY[lesson_id])
+        lesson = Lesson(name=lesson_name, key_resource_id=lesson_url, lang=self.lang,
+            extra_resources=extra_resources_urls, path=[self.state, self.subject, self.level])
+        lesson.download()
+        lesson_node = lesson.to_node()
+        LESSONS_REGISTRY[lesson_id] = lesson_node
+        return lesson_node
+
+    def empty_state_node(self):
+        return TopicNode(
+            source_id=self.state,
+            title=self.state,
+            description="",
+            license=None,
+            language=self.lang,
+            children=[]
+        )
+
+    def empty_subject_node(self):
+        return TopicNode(
+            source_id=self.subject,
+            title=self.subject,
+            description="",
+            license=None,
+            language=self.lang,
+            children=[]
+        )
+
+    def empty_level_node(self):
+        return TopicNode(
+            source_id=self.level,
+            title=self.level,
+            description="",
+            license=None,
+            language=self.lang,
+            children=[]
+        )
+
+    def build_tree(self, nodes, subtree=None, tree_level=0, tree_index=None):
+        if tree_index is None:
+            tree_index = LevelIndex()
+        path = [self.state, self.subject, self.level]
+        if tree_level == 0:
+            if subtree is None:
+                root = self.empty_state_node()
+                tree_index.add(path[:1], root)
+            else:
+                root = subtree
+            subject = self.empty_subject_node()
+            tree_index.add(path[:2], subject)
+            if self.level is not None:
+                level = self.empty_level_node()
+                tree_index.add(path, level)
+                level["children"].extend(nodes)
+                subject["children"].append(level)
+            else:
+                subject["children"].extend(nodes)
+            root["children"].append(subject)
+            return root
+        elif tree_level == 1:
+            subject = subtree
+            if self.level is not None:
+                level = self.empty_level_node()
+                tree_index.add(path, level)
+                level["children"].extend(nodes)
+                subject["children"].append(level)
+            else:
+                subject["children"].extend(nodes)
+        elif tree_level == 2:
+            level = subtree
+            level["children"].extend(nodes)
+
+    def get_tree_level(self, channel_tree, tree_index=None):
+        if tree_index is None:
+            get_level = lambda levels: get_level_map(channel_tree, levels)
+        else:
+            get_level = tree_index.get
+        subtree = get_level([self.state, self.subject, self.level])
+        level = 2
+        if subtree is None:
+            subtree = get_level([self.state, self.subject])
+            level -= 1
+            if subtree is None:
+                subtree = get_level([self.state])
+                level -= 1
+        return subtree, level
+
+    def to_tree(self, channel_tree, tree_index=None):
+        subtree, tree_level = self.get_tree_level(channel_tree, tree_index=tree_index)
+        root = self.build_tree(self.nodes, subtree, tree_level=tree_level, tree_index=tree_index)
+        if subtree is None and root is not None:
+            channel_tree["children"].append(root)
+                
+
+class Lesson(object):
+    def __init__(self, name=None, key_resource_id=None, extra_resources=None, 
+                path=None, lang="en"):
+        self.key_resource_id = normalize_url(key_resource_id)
+        self.filename = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        self.title = name if len(name) < 80 else name[:80]
+        self.path_levels = path
+        self.lang = lang
+        self.file = None
+        self.video = None
+        self.ids = set([])
+        LOGGER.info("Collecting: {}".format(self.key_resource_id))
+        LOGGER.info("   - Name: {}".format(self.title))
+        LOGGER.info("   - Lang: {}".format(self.lang))
+        self.html = HTMLLesson(source_id=self.key_resource_id, name=self.title, 
+            lang=self.lang)
+        if self.path_levels[-1] is None:
+            self.base_path = build_path([DATA_DIR] + self.path_levels[:-1] + [self.filename])
+        else:
+            self.base_path = build_path([DATA_DIR] + self.path_levels + [self.filename])
+        if extra_resources is not None:
+            LOGGER.info("   - Extra resources: {}".format(len(extra_resources)))
+            self.set_extra_resources(extra_resources)
+
+    def set_extra_resources(self, extra_resources):
+        for resource in extra_resources:
+            LOGGER.info("   - Resource: {}".format(resource))
+            if resource.endswith(".pdf"):
+                self.file = File(resource, lang=self.lang, name=self.title)
+            elif resource.endswith(".doc") or resource.endswith(".docx"):
+                pass
+            else:
+                resource = urljoin(BASE_URL, resource.strip())
+                if resource != self.key_resource_id:
+                    self.video = HTMLLesson(source_id=resource, 
+                        name=self.title + " - Videos", lang=self.lang)
+
+    def download(self):
+        self.html.scrape(self.base_path, name="index")
+        if self.file:
+            discovered("pdf", [self.file.source_id])
+            self.file.download(self.base_path)
+        if self.video:
+            self.video.scrape(self.base_path, name="video")
+
+    def to_node(self):
+        topic_node = TopicNode(
+            source_id=self.key_resource_id,
+            title=self.title,
+            description="",
+            language=self.lang,
+            license=None,
+            children=[]
+        )
+
+        for html_node in self.html.to_nodes():
+            if html_node is not None and html_node["source_id"] not in self.ids:
+                topic_node["children"].append(html_node)
+                self.ids.add(html_node["source_id"])
+
+        if self.file is not None:
+            file_node = self.file.to_node()
+            if file_node is not None and file_node["source_id"] not in self.ids:
+                topic_node["children"].append(file_node)
+                self.ids.add(file_node["source_id"])
+
+        if self.video is not None:
+            videos_nodes = self.video.to_nodes()
+            for video_node in videos_nodes:
+                if video_node is not None and video_node["source_id"] not in self.ids:
+                    topic_node["children"].append(video_node)
+                    self.ids.add(video_node["source_id"])
+        
+        return topic_node
+        
+
+class File(object):
+    def __init__(self, source_id, lang="en", lincese="", name=None):
+        self.filename = get_name_from_url(source_id)
+        self.source_id = urljoin(BASE_URL, source_id) if source_id.startswith("/") else source_id
+        self.filepath = None
+        self.lang = lang
+        self.name = "{}_{}".format(name, self.filename)
+        self.license = shared_license(licenses.CC_BY_NC_SA, copyright_holder=COPYRIGHT_HOLDER)
+
+    def download(self, base_path):
+        PDFS_DATA_DIR = build_path([base_path, 'pdfs'])
+        try:
+            response = FETCHER.get(self.source_id)
+            PROGRESS.downloaded(len(response.content))
+            content_type = response.headers.get('content-type', '')
+            if 'application/pdf' in content_type:
+                self.filepath = os.path.join(PDFS_DATA_DIR, self.filename)
+                with open(self.filepath, 'wb') as f:
+                    f.write(response.content)
+                finished("pdf", self.source_id)
+                LOGGER.info("   - Get file: {}, node name: {}".format(self.filename, self.name))
+            else:
+                failed("pdf", self.source_id, "Not a pdf: {}".format(content_type))
+        except requests.exceptions.HTTPError as e:
+            LOGGER.info("Error: {}".format(e))
+            failed("pdf", self.source_id, e)
+        except requests.exceptions.ConnectionError as e:
+            ### this is a weird error, may be it's raised when the webpage
+            ### is slow to respond requested resources
+            LOGGER.info("Connection error, the resource will be scraped in 5s...")
+            failed("pdf", self.source_id, e)
+            time.sleep(3)
+        except requests.exceptions.ReadTimeout as e:
+            LOGGER.info("Error: {}".format(e))
+            failed("pdf", self.source_id, e)
+        except requests.exceptions.TooManyRedirects as e:
+            LOGGER.info("Error: {}".format(e))
+            failed("pdf", self.source_id, e)
+
+    def to_node(self):
+        if self.filepath is not None:
+            node = DocumentNode(
+                source_id=self.source_id,
+                title=self.name,
+                description='',
+                files=[dict(
+                    file_type=content_kinds.DOCUMENT,
+                    path=self.filepath
+                )],
+                language=self.lang,
+                license=self.license)
+            return node
+
+
+class HTMLLesson(object):
+    def __init__(self, source_id=None, lang="en", name=None):
+        self.source_id = source_id
+        self.filepath = None
+        self.name = name
+        self.lang = lang
+        self.menu = Menu(lang=self.lang, name=name)
+        self.license = shared_license(licenses.CC_BY_NC_SA, copyright_holder=COPYRIGHT_HOLDER)
+
+    def sections_to_menu(self):
+        page = download(self.source_id)
+        if page:
+            content = page.find("main", class_="content-main")
+            ul = content.find(lambda tag: tag.name == "ul" and tag.findParent("div", class_="content"))
+            self.menu.index_content = ul
+            links = []
+            for link in content.findAll("a"):
+                href = link.get("href", "")
+                links_class = link.get("class", [])
+                if href:# and "active" not in links_class:
+                    links.append((link.text, urljoin(self.source_id, href)))
+            discovered("section", [url for _, url in links])
+            FETCHER.prefetch([url for _, url in links])
+            for title, url in links:
+                self.menu.add_item(title=title, url=url)
+
+    def scrape(self, base_path, name="htmlapp"):
+        self.filepath = "{path}/{name}.zip".format(path=base_path, name=name)
+        self.sections_to_menu()
+        self.menu.to_file(self.filepath, base_path)
+
+    def to_nodes(self):
+        if self.menu.is_valid:
+            menu_node = self.menu.to_nodes()
+            node = HTML5Node(
+                source_id=self.source_id,
+                title=self.name,
+                description="",
+                thumbnail=None,
+                author="",
+                files=[dict(
+                    file_type=content_kinds.HTML5,
+                    path=self.filepath
+                )],
+                language=self.lang,
+                license=self.license)
+            return [node] + menu_node
+        else:
+            return []
+
+
+class Menu(object):
+    def __init__(self, lang="en", name=None):
+        self.items = OrderedDict()
+        self.index_content = None
+        self.images = {}
+        self.pdfs_url = set([])
+        self.nodes = []
+        self.ids = set([])
+        self.is_valid = False
+        self.lang = lang
+        self.name = name
+
+    def build_index(self, directory="files/"):
+        items = iter(self.items.values())
+        if self.index_content is not None:
+            self.index_content["class"] = "sidebar-items"
+            for ul in self.index_content:
+                if hasattr(ul, 'findAll'):
+                    for a in ul.findAll("a"):
+                        item = next(items)
+                        a["href"] = "{}{}".format(directory, item["filename"])
+                        a["class"] = "sidebar-link"
+                else:
+                    return
+            self.is_valid = True
+            return str(self.index_content)
+
+    def add_item(self, title=None, url=None):
+        filename = self.item_to_filename(title)
+        if url not in self.items:
+            content = self.get_sections_content(url)
+            finished("section", url)
+            self.items[url] = {"title": title, "filename": filename, "content": content}
+
+    def clean_content(self, content):
+        content.find("div", class_="addthis").decompose()
+        obj_tags = content.find_all("div", class_="oucontent-media")#oucontent-embedtemplate")
+        if obj_tags is not None:
+            for obj_tag in obj_tags:
+                obj_tag.decompose()
+        if content is not None:
+            for link in content.find_all("a"):
+                if "active" not in link.attrs.get("class", []):
+                    link.replaceWithChildren()
+
+    def pager(self, content, index):
+        ul = content.find("ul", class_="pager")
+        first_page = ul.find(lambda tag: tag.name == "a" and tag.findParent("li", class_="pager-first"))
+        last_page = ul.find(lambda tag: tag.name == "a" and tag.findParent("li", class_="pager-last"))
+        previous = ul.find(lambda tag: tag.name == "a" and tag.findParent("li", class_="pager-previous"))
+        next = ul.find(lambda tag: tag.name == "a" and tag.findParent("li", class_="pager-next"))
+        if first_page is not None:
+            first_page["href"] = "../index.html"
+        items = list(self.items.values())
+        if last_page is not None:
+            last_page["href"] = items[-1]["filename"]
+        if previous is not None:
+            if index > 0:
+                previous["href"] = items[index - 1]["filename"]
+            else:
+                previous["href"] = first_page["href"]
+        if next is not None:
+            if index < len(items) - 1:
+                next["href"] = items[index + 1]["filename"]
+            else:
+                next["href"] = last_page["href"]
+
+    def get_sections_content(self, url):
+        page = download(url)
+        content = page.find("section", class_="main-content")
+        return content
+
+    def get_images(self, content):
+        for img in content.findAll("img"):
+            if img["src"].startswith("/"):
+                img_src = urljoin(BASE_URL, img["src"])
+            else:
+                img_src = img["src"]
+            filename = get_name_from_url(img_src)
+            if img_src not in self.images and img_src:
+                img["src"] = filename
+                self.images[img_src] = filename
+
+    def write_pdfs(self, base_path, content):
+        for tag_a in content.findAll(lambda tag: tag.name == "a" and tag.attrs.get("href", "").endswith(".pdf")):
+            pdf_url = tag_a.get("href", "")
+            if pdf_url not in self.pdfs_url and pdf_url:
+                self.pdfs_url.add(pdf_url)
+                pdf_file = File(pdf_url, lang=self.lang, name=self.name)
+                discovered("pdf", [pdf_file.source_id])
+                pdf_file.download(base_path)
+                node = pdf_file.to_node()
+                if node is not None and node["source_id"] not in self.ids:
+                    self.nodes.append(node)
+                    self.ids.add(node["source_id"])
+
+    def write_video(self, base_path, content):
+        videos = content.find_all(lambda tag: tag.name == "a" and tag.attrs.get("href", "").find("youtube") != -1 or tag.attrs.get("href", "").find("youtu.be") != -1 or tag.text.lower() == "youtube")
+        VIDEOS_DATA_DIR = build_path([base_path, 'videos'])
+        for video in videos:
+            youtube = YouTubeResource(video.get("href", ""), lang=self.lang)
+            node = get_node_from_channel(youtube.resource_url, channel_tree)
+            if node is None:
+                discovered("video", [youtube.resource_url])
+                youtube.to_file(filepath=VIDEOS_DATA_DIR)
+                node = youtube.node
+                if node is not None:
+                    finished("video", youtube.resource_url)
+                else:
+                    failed("video", youtube.resource_url, youtube.error or "Not downloaded")
+
+            if node is not None:
+                if video.parent.name == 'li':
+                    video.parent.replace_with("Video name: " + node["title"])
+                if node["source_id"] not in self.ids:
+                    self.nodes.append(node)
+                    self.ids.add(node["source_id"])
+
+    def css_js_entries(self):
+        with open("chefdata/styles.css") as css, open("chefdata/scripts.js") as js:
+            return [("css/styles.css", css.read()), ("js/scripts.js", js.read())]
+
+    def stage_images(self):
+        """
+        Download the images to the staging directory of the run and return the
+        [(path in the zip, staged filepath)]. The images are read with FETCHER on
+        every run (so they are cached and recorded by the snapshot), a staged
+        file is removed when the zips that use it are assembled.
+        """
+        # the first image of every path in the zip is downloaded
+        sources = OrderedDict()
+        for img_src, img_filename in self.images.items():
+            sources.setdefault("files/{}".format(img_filename), img_src)
+        discovered("image", list(sources.values()))
+        FETCHER.prefetch(list(sources.values()))
+        images = []
+        for path, img_src in sources.items():
+            try:
+                staged_filepath = ZIP_ASSEMBLER.stage(img_src, lambda: self.read_image(img_src))
+            except requests.exceptions.HTTPError as e:
+                failed("image", img_src, e)
+                continue
+            finished("image", img_src)
+            images.append((path, staged_filepath))
+        return images
+
+    def read_image(self, img_src):
+        content = FETCHER.read(img_src)
+        PROGRESS.downloaded(len(content))
+        return content
+
+    def item_to_filename(self, name):
+        name = "_".join(name.lower().split(" "))
+        hash_name = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return "{}.html".format(hash_name)
+
+    @PROFILER.wrap("html")
+    def to_file(self, filepath, base_path):
+        """
+        Download the images and build the html of the sections, the zip is
+        assembled from them by ZIP_ASSEMBLER in another process
+        """
+        index_content_str = self.build_index()
+        if index_content_str is not None:
+            entries = [("index.html", '<html><head><meta charset="utf-8"><link rel="stylesheet" href="css/styles.css"></head><body><div class="main-content-with-sidebar">{}</div><script src="js/scripts.js"></script></body></html>'.format(index_content_str))]
+            entries += self.css_js_entries()
+            for item in self.items.values():
+                self.get_images(item["content"])
+            images = self.stage_images()
+            for i, item in enumerate(self.items.values()):
+                file_nodes = self.write_pdfs(base_path, item["content"])
+                video_nodes = self.write_video(base_path, item["content"])
+                self.pager(item["content"], i)
+                self.clean_content(item["content"])
+                content = '<div class="sidebar"><a class="sidebar-link toggle-sidebar-button" href="javascript:void(0)" onclick="javascript:toggleNavMenu();">&#9776;</a>'+\
+                self.build_index(directory="./") +"</div>"+\
+                '<div class="main-content-with-sidebar">'+str(item["content"])+'</div>'
+                content = '<html><head><meta charset="utf-8"><link rel="stylesheet" href="../css/styles.css"></head><body>{}<script src="../js/scripts.js"></script></body></html>'.format(content)
+                entries.append(("files/{}".format(item["filename"]), content))
+            ZIP_ASSEMBLER.submit(filepath, entries, images, name=self.name)
+
+    def to_nodes(self):
+        return self.nodes
+
+
+class ResourceType(object):
+    """
+        Base class for File, WebPage, Video, Audio resources
+    """
+    def __init__(self, type_name=None, source_id=None):
+        LOGGER.info("Resource Type: {} [{}]".format(type_name, source_id))
+        self.type_name = type_name
+        self.node = None
+        self.resource_url = source_id
+
+    def to_file(self, filepath=None):
+        pass
+
+
+class YouTubeResource(ResourceType):
+    def __init__(self, resource_url, type_name="Youtube", lang="en"):
+        super(YouTubeResource, self).__init__(type_name=type_name, 
+            source_id=self.clean_url(resource_url))        
+        self.file_format = file_formats.MP4
+        self.lang = lang
+        self.info_error = None
+        # the error of the last download, saved in the frontier as the failure
+        self.error = None
+        self.filename = None
+        self.filepath = None
+
+    def clean_url(self, url):
+        if url[-1] == "/":
+            url = url[:-1]
+        return url.strip()
+
+    @classmethod
+    def is_youtube(self, url, get_channel=False):
+        youtube = url.find("youtube") != -1 or url.find("youtu.be") != -1
+        if get_channel is False:
+            youtube = youtube and url.find("user") == -1 and url.find("/c/") == -1
+        return youtube
+
+    @classmethod
+    def transform_embed(self, url):
+        url = "".join(url.split("?")[:1])
+        return url.replace("embed/", "watch?v=").strip()
+
+    def get_video_info(self, download_to=None, subtitles=True):
+        import youtube_dl
+        ydl_options = {
+                'writesubtitles': subtitles,
+                'allsubtitles': subtitles,
+                'no_warnings': True,
+                'restrictfilenames':True,
+                'continuedl': True,
+                'quiet': False,
+                'format': "bestvideo[height<={maxheight}][ext=mp4]+bestaudio[ext=m4a]/best[height<={maxheight}][ext=mp4]".format(maxheight='480'),
+                'outtmpl': '{}/%(id)s'.format(download_to),
+                'noplaylist': False
+            }
+
+        with youtube_dl.YoutubeDL(ydl_options) as ydl:
+            try:
+                ydl.add_default_info_extractors()
+                info = ydl.extract_info(self.resource_url, download=(download_to is not None))
+                return info
+            except(youtube_dl.utils.DownloadError, youtube_dl.utils.ContentTooShortError,
+                    youtube_dl.utils.ExtractorError) as e:
+                LOGGER.info('An error occured ' + str(e))
+                LOGGER.info(self.resource_url)
+                # the failure is recorded by download, not by the subtitles lookup
+                self.info_error = e
+            except KeyError as e:
+                LOGGER.info(str(e))
+
+    def failure_class(self, error):
+        """
+        youtube_dl wraps the network errors, those are transient and the
+        others (unavailable or private videos, etc) are permanent
+        """
+        import youtube_dl
+        if isinstance(error, youtube_dl.utils.ContentTooShortError):
+            return FailureCache.TRANSIENT
+        causes = [getattr(error, "cause", None)]
+        exc_info = getattr(error, "exc_info", None)
+        if exc_info:
+            causes.extend([exc_info[1], getattr(exc_info[1], "cause", None)])
+        if any(isinstance(cause, OSError) for cause in causes):
+            return FailureCache.TRANSIENT
+        return FailureCache.PERMANENT
+
+    def subtitles_dict(self):
+        subs = []
+        video_info = self.get_video_info()
+        if video_info is not None:
+            video_id = video_info["id"]
+            if 'subtitles' in video_info:
+                subtitles_info = video_info["subtitles"]
+                LOGGER.info("Subtitles: {}".format(",".join(subtitles_info.keys())))
+                for language in subtitles_info.keys():
+                    subs.append(dict(file_type=SUBTITLES_FILE, youtube_id=video_id, language=language))
+        return subs
+
+    def process_file(self, download=False, filepath=None):
+        self.download(download=download, base_path=filepath)
+        if self.filepath:
+            files = [dict(file_type=content_kinds.VIDEO, path=self.filepath)]
+            files += self.subtitles_dict()
+
+            self.node = VideoNode(
+                source_id=self.resource_url,
+                title=self.filename,
+                description='',
+                files=files,
+                language=self.lang,
+                license=shared_license(licenses.CC_BY, copyright_holder=COPYRIGHT_HOLDER))
+
+    @PROFILER.wrap("video")
+    def download(self, download=True, base_path=None):
+        import youtube_dl
+        if not "watch?" in self.resource_url or "/user/" in self.resource_url or\
+            download is False:
+            return
+
+        failure = VIDEO_FAILURES.get(self.resource_url)
+        if failure is not None:
+            LOGGER.info("Skipping video, {} failure: {}".format(failure["failure"], failure["error"]))
+            self.error = failure["error"]
+            return
+
+        download_to = base_path
+        error = None
+        for i in range(4):
+            self.info_error = None
+            try:
+                info = self.get_video_info(download_to=download_to, subtitles=False)
+                if info is not None:
+                    LOGGER.info("Video resolution: {}x{}".format(info.get("width", ""), info.get("height", "")))
+                    self.filepath = os.path.join(download_to, "{}.mp4".format(info["id"]))
+                    self.filename = info["title"]
+                    if self.filepath is not None and os.stat(self.filepath).st_size == 0:
+                        LOGGER.info("Empty file")
+                        self.error = "Empty file"
+                        self.filepath = None
+                    if self.filepath is not None:
+                        PROGRESS.downloaded(os.stat(self.filepath).st_size)
+                    if self.filepath is not None and TRANSCODER is not None:
+                        self.filepath = TRANSCODER.submit(self.filepath, info["id"])
+            except (ValueError, IOError, OSError, URLError, ConnectionResetError) as e:
+                LOGGER.info(e)
+                LOGGER.info("Download retry")
+                error = e
+                time.sleep(.8)
+            except (youtube_dl.utils.DownloadError, youtube_dl.utils.ContentTooShortError,
+                    youtube_dl.utils.ExtractorError, OSError) as e:
+                LOGGER.info("An error ocurred, may be the video is not available.")
+                self.error = e
+                return
+            except OSError as e:
+                self.error = e
+                return
+            else:
+                if info is not None:
+                    VIDEO_FAILURES.remove(self.resource_url)
+                    return
+                if self.info_error is None:
+                    return
+                self.error = self.info_error
+                if self.failure_class(self.info_error) == FailureCache.PERMANENT:
+                    VIDEO_FAILURES.add(self.resource_url, FailureCache.PERMANENT, self.info_error)
+                    return
+                # a network error wrapped by youtube_dl, it's recorded if the retries fail too
+                LOGGER.info("Download retry")
+                error = self.info_error
+                time.sleep(.8)
+        self.error = error
+        VIDEO_FAILURES.add(self.resource_url, FailureCache.TRANSIENT, error)
+
+    def to_file(self, filepath=None):
+        if "watch?" in self.resource_url or not "/user/" in self.resource_url: 
+            self.process_file(download=DOWNLOAD_VIDEOS, filepath=filepath)
+
+
+#The urls found and scraped are counted in PROGRESS and saved in the frontier
+def discovered(kind, urls):
+    PROGRESS.discovered(kind, urls)
+    if FRONTIER is not None:
+        FRONTIER.add_many([(url, None) for url in urls], kind)
+
+
+def finished(kind, url, result=None):
+    PROGRESS.finished(kind, url)
+    if FRONTIER is not None:
+        FRONTIER.done(url, kind, result=result)
+
+
+def failed(kind, url, error=None):
+    if FRONTIER is not None:
+        FRONTIER.fail(url, kind, error=str(error))
+
+
+def normalize_url(url):
+    return urljoin(BASE_URL, url.strip())
+
+
+def filter_resources(resources, states=None, subjects=None, levels=None):
+    """
+    Yield the crawled listings that match the given states, subjects and levels,
+    an empty filter matches everything
+    """
+    for resource in resources:
+        if states and resource["state_lang"].strip() not in states:
+            continue
+        if subjects and resource["subject_name"].strip() not in subjects:
+            continue
+        if levels and (resource["level_name"] or "").strip() not in levels:
+            continue
+        yield resource
+
+
+def is_lesson_node(node):
+    return node["source_id"].startswith("http")
+
+
+#Merge the nodes of a partial scrape into a previous channel tree, the state,
+#subject and level topics are merged and the lessons are replaced
+#if replace is False the nodes already in the tree are kept
+def splice_channel_tree(tree, subtree, replace=True):
+    children = tree.setdefault("children", [])
+    index = {child["source_id"]: i for i, child in enumerate(children)}
+    for node in subtree.get("children", []):
+        i = index.get(node["source_id"])
+        if i is None:
+            index[node["source_id"]] = len(children)
+            children.append(node)
+        elif "children" in node and "children" in children[i] and not is_lesson_node(node):
+            splice_channel_tree(children[i], node, replace=replace)
+        elif replace:
+            children[i] = node
+
+
+def remove_duplicated_lessons(tree, seen=None):
+    """
+    Remove the lessons (and the other nodes under the topics) whose source_id is
+    already in the tree, the first one in the tree's order is kept
+    """
+    if seen is None:
+        seen = set([])
+    children = []
+    for node in tree.get("children", []):
+        if is_lesson_node(node):
+            if node["source_id"] in seen:
+                continue
+            seen.add(node["source_id"])
+        else:
+            remove_duplicated_lessons(node, seen=seen)
+        children.append(node)
+    tree["children"] = children
+
+
+def shard_resources(resources, shards, shard, shard_by="state"):
+    """
+    Yield the crawled listings of the shard, the distinct states (or subjects) are
+    sorted and dealt to the shards in turn, so every machine gets the same split
+    """
+    field = {"state": "state_lang", "subject": "subject_name"}[shard_by]
+    keys = sorted(set(resource[field].strip() for resource in resources))
+    owners = {key: i % shards for i, key in enumerate(keys)}
+    for resource in resources:
+        if owners[resource[field].strip()] == shard:
+            yield resource
+
+
+#Sort the state, subject and level topics of the tree in the crawling order
+def sort_channel_tree(channel_tree, web_resource_tree):
+    order = {}
+    for resource in web_resource_tree["children"]:
+        path = (resource["state_lang"], resource["subject_name"], resource["level_name"])
+        for depth in range(1, 4):
+            order.setdefault(path[:depth], len(order))
+
+    def sort_children(tree, path):
+        if len(path) == 3:
+            return
+        topics = [(i, child) for i, child in enumerate(tree.get("children", []))
+            if (path + (child["source_id"],)) in order]
+        sorted_topics = sorted((child for _, child in topics),
+            key=lambda child: order[path + (child["source_id"],)])
+        for (i, _), child in zip(topics, sorted_topics):
+            tree["children"][i] = child
+        for _, child in topics:
+            sort_children(child, path + (child["source_id"],))
+
+    sort_children(channel_tree, ())
+
+
+def download(source_id):
+    from bs4 import BeautifulSoup
+    tries = 0
+    while tries < 4:
+        try:
+            document = FETCHER.read(source_id)
+            PROGRESS.downloaded(len(document))
+        except requests.exceptions.HTTPError as e:
+            LOGGER.info("Error: {}".format(e))
+        except requests.exceptions.ConnectionError:
+            ### this is a weird error, may be it's raised when the webpage
+            ### is slow to respond requested resources
+            LOGGER.info("Connection error, the resource will be scraped in 5s...")
+            time.sleep(3)
+        except requests.exceptions.TooManyRedirects as e:
+            LOGGER.info("Error: {}".format(e))
+        else:
+            return BeautifulSoup(document, 'html.parser') #html5lib
+        tries += 1
+    return False
+
+
+#When a node has only one child and this child it's a object (file, video, etc),
+#this is moved to an upper level
+def clean_leafs_nodes_plus(channel_tree):
+    children = channel_tree.get("children", None)
+    if children is None:
+        return
+    elif len(children) == 1 and not "children" in children[0]:
+        return channel_tree["children"][0]
+    elif len(children) == 0:
+        return -1
+    else:
+        del_nodes = []
+        for i, node in enumerate(children):
+            leaf_node = clean_leafs_nodes_plus(node)
+            if leaf_node is not None and leaf_node != -1:
+                if leaf_node["source_id"].endswith(".js"):
+                    levels = leaf_node["source_id"].split("/")
+                    parent_dir = levels[-2] #dirname
+                    leaf_node["title"] = "{}_{}".format(parent_dir, leaf_node["title"])
+                children[i] = leaf_node
+            elif leaf_node == -1:
+                del children[i]
+            elif leaf_node is None:
+                try:
+                    if len(node["children"]) == 0:
+                        del children[i]
+                    elif len(node["children"]) == 1:
+                        children[i] = node["children"][0]
+                except KeyError:
+                    pass
+
+
+def language_map(subject):
+    lang_map = {
+        "All India - English": "en",
+        "अखिल भारतीय हिंदी": "hi",
+        "उत्तर प्रदेश": "hi",
+        "बिहार": "hi",
+        "मध्य प्रदेश": "hi",
+        "অসম": "as",
+        "পশ্চিমবঙ্গ": "bn",
+        "ଓଡ଼ିଶା": "or",
+        "ಕರ್ನಾಟಕ":  "kn"
+    }
+    return lang_map.get(subject, "en")
+
+
+class TESSIndiaChef(JsonTreeChef):
+    HOSTNAME = BASE_URL
+    TREES_DATA_DIR = os.path.join(DATA_DIR, 'trees')
+    SHARDS_DATA_DIR = os.path.join(TREES_DATA_DIR, 'shards')
+    CRAWLING_STAGE_OUTPUT_TPL = 'web_resource_tree.json'
+    SCRAPED_STAGE_OUTPUT_TPL = 'scraped_tree.json'
+    SCRAPING_STAGE_OUTPUT_TPL = 'ricecooker_json_tree.json'
+    LICENSE = shared_license(licenses.CC_BY_NC_SA, copyright_holder=COPYRIGHT_HOLDER)
+    THUMBNAIL = ""
+
+    def __init__(self):
+        build_path([TESSIndiaChef.TREES_DATA_DIR])
+        self.scrape_stage = os.path.join(TESSIndiaChef.TREES_DATA_DIR, 
+                                TESSIndiaChef.SCRAPING_STAGE_OUTPUT_TPL)
+        self.crawling_stage = os.path.join(TESSIndiaChef.TREES_DATA_DIR, 
+                                TESSIndiaChef.CRAWLING_STAGE_OUTPUT_TPL)
+        # the channel tree before clean_leafs_nodes_plus, used to splice partial scrapes
+        self.scraped_stage = os.path.join(TESSIndiaChef.TREES_DATA_DIR, 
+                                TESSIndiaChef.SCRAPED_STAGE_OUTPUT_TPL)
+        super(TESSIndiaChef, self).__init__()
+
+    def run(self, args, options):
+        shard = self.get_shard(options)
+        if shard is None:
+            super(TESSIndiaChef, self).run(args, options)
+            return
+        # a shard is only a part of the channel, it's scraped by pre_run and
+        # uploaded after the merge
+        self.pre_run(args, options)
+        LOGGER.info("Shard {} of {} saved in {}".format(shard[0], shard[1],
+            os.path.dirname(self.shard_stages(*shard)[1])))
+
+    def pre_run(self, args, options):
+        self.setup_cache(options)
+        self.setup_fetcher(options)
+        self.setup_frontier(options)
+        self.setup_transcoder(options)
+        self.setup_html5_zips(options)
+        self.setup_progress(options)
+        self.setup_profiler(options)
+        try:
+            self.build_trees(args, options)
+        finally:
+            # the pools, the staged images, the fetcher and the progress are not left
+            # behind if the run fails or stops
+            self.close_resources()
+
+    def close_resources(self):
+        if TRANSCODER is not None:
+            TRANSCODER.close()
+        ZIP_ASSEMBLER.close()
+        FETCHER.close()
+        if FRONTIER is not None:
+            FRONTIER.close()
+        PROGRESS.stop()
+        PROFILER.stop()
+
+    def build_trees(self, args, options):
+        """
+        Crawl and scrape the channel (or merge the shards) and write its trees
+        """
+        if int(options.get('retry_videos', '0')) == 1:
+            VIDEO_FAILURES.clear()
+        if options.get('merge'):
+            channel_tree = self.merge_shards(options['merge'])
+            clean_leafs_nodes_plus(channel_tree)
+            self.write_tree_to_json(channel_tree, "en")
+            return
+        css = os.path.join(os.path.dirname(os.path.realpath(__file__)), "chefdata/styles.css")
+        js = os.path.join(os.path.dirname(os.path.realpath(__file__)), "chefdata/scripts.js")
+        if not if_file_exists(css) or not if_file_exists(js):
+            LOGGER.info("Downloading styles")
+            self.download_css_js()
+        reuse_crawl = self.is_partial_scrape(options) or self.get_shard(options) is not None
+        if not reuse_crawl or not if_file_exists(self.crawling_stage):
+            with PROFILER.stage("crawl"):
+                self.crawl(args, options)
+        channel_tree = self.scrape(args, options)
+        if TRANSCODER is not None:
+            LOGGER.info("Waiting for {} videos to be transcoded".format(TRANSCODER.pending()))
+            replace_files_paths(channel_tree, TRANSCODER.wait())
+        LOGGER.info("Waiting for {} HTML5 zips to be assembled".format(ZIP_ASSEMBLER.pending()))
+        remove_files_nodes(channel_tree, ZIP_ASSEMBLER.wait())
+        if FRONTIER is not None and not self.is_partial_scrape(options) and \
+                FRONTIER.pending("listing") > 0:
+            # the listings claimed by other workers (or by a crashed worker of another
+            # host, until its lease expires) are not in the tree yet
+            sys.exit("{} listings of the frontier are not scraped yet, the tree is not written "
+                "nor uploaded".format(FRONTIER.pending("listing")))
+        shard = self.get_shard(options)
+        if shard is not None:
+            scraped_stage, scrape_stage = self.shard_stages(*shard)
+        else:
+            scraped_stage, scrape_stage = self.scraped_stage, self.scrape_stage
+        with open(scraped_stage, 'w', encoding='utf-8') as f:
+            json.dump(to_dict(channel_tree), f, indent=2, ensure_ascii=False)
+        clean_leafs_nodes_plus(channel_tree)
+        write_tree_to_json_tree(scrape_stage, to_dict(channel_tree))
+        LOGGER.info("Progress: {}".format(PROGRESS.status_line()))
+        if cache is not None:
+            stats = cache.stats()
+            LOGGER.info("Web cache: {} entries, {:.1f} of {:.1f} MB".format(stats["entries"],
+                stats["bytes"] / 1024**2, stats["max_bytes"] / 1024**2))
+
+    def get_shard(self, options):
+        """
+        Return the (shard, shards) of the options shards=<N> shard=<0..N-1>, or None
+        """
+        if options.get('shards') is None:
+            return None
+        shards, shard = int(options['shards']), int(options.get('shard', 0))
+        if not 0 <= shard < shards:
+            raise ValueError("shard must be between 0 and {}".format(shards - 1))
+        return shard, shards
+
+    def shard_stages(self, shard, shards):
+        shard_dir = build_path([TESSIndiaChef.SHARDS_DATA_DIR, "shard-{}-of-{}".format(shard, shards)])
+        return (os.path.join(shard_dir, TESSIndiaChef.SCRAPED_STAGE_OUTPUT_TPL),
+            os.path.join(shard_dir, TESSIndiaChef.SCRAPING_STAGE_OUTPUT_TPL))
+
+    def merge_shards(self, pattern):
+        """
+        Merge the scraped trees of the shards in one channel tree, the topics are
+        sorted in the crawling order and a lesson scraped by several shards
+        (the same source_id) is only added once
+        """
+        if pattern == "1":
+            pattern = os.path.join(TESSIndiaChef.SHARDS_DATA_DIR, "*",
+                TESSIndiaChef.SCRAPED_STAGE_OUTPUT_TPL)
+        paths = sorted(glob.glob(pattern))
+        if len(paths) == 0:
+            raise IOError("There are not shards trees in: {}".format(pattern))
+        with open(self.crawling_stage, 'r') as f:
+            web_resource_tree = json.load(f)
+        global channel_tree
+        channel_tree = self.empty_channel_tree()
+        for path in paths:
+            LOGGER.info("Merging: {}".format(path))
+            splice_channel_tree(channel_tree, load_tree(path), replace=False)
+        sort_channel_tree(channel_tree, web_resource_tree)
+        remove_duplicated_lessons(channel_tree)
+        return channel_tree
+
+    def setup_cache(self, options):
+        global CACHE_MAX_BYTES, CACHE_MAX_AGE
+        if options.get('cache_size') is not None:
+            CACHE_MAX_BYTES = int(float(options['cache_size']) * 1024**2)
+        if options.get('cache_max_age') is not None:
+            CACHE_MAX_AGE = float(options['cache_max_age']) * 24 * 3600
+
+    def setup_frontier(self, options):
+        # frontier=1 saves the discovered urls and the scraped listings in FRONTIER_PATH,
+        # several chef processes can scrape the listings of the same frontier
+        global FRONTIER
+        if int(options.get('frontier', '0')) == 1:
+            FRONTIER = Frontier(FRONTIER_PATH, lease=int(options.get('frontier_lease', 3600)))
+            LOGGER.info("Frontier: {}".format(FRONTIER_PATH))
+
+    def setup_transcoder(self, options):
+        # transcode=low|medium re-encodes the videos with ffmpeg in transcode_workers processes
+        global TRANSCODER
+        profile = options.get('transcode')
+        if profile is None:
+            return
+        if not has_ffmpeg():
+            LOGGER.info("ffmpeg is not installed, the videos will not be transcoded")
+            return
+        TRANSCODER = Transcoder(profile, TRANSCODED_DATA_DIR,
+            max_workers=int(options.get('transcode_workers', 2)))
+
+    def setup_html5_zips(self, options):
+        # zip_workers=<n> processes assemble the zips (default: the number of cpus),
+        # zip_workers=0 assembles them in the scraping thread
+        global MINIFY_HTML, ZIP_TEXT_LEVEL, ZIP_ASSEMBLER
+        MINIFY_HTML = int(options.get('minify', '0')) == 1
+        if options.get('zip_level') is not None:
+            ZIP_TEXT_LEVEL = int(options['zip_level'])
+        ZIP_ASSEMBLER = ZipAssembler(max_workers=int(options.get('zip_workers', os.cpu_count() or 2)),
+            minify=MINIFY_HTML, text_compresslevel=ZIP_TEXT_LEVEL, staging_root=STAGING_DATA_DIR,
+            profiler=PROFILER)
+
+    def setup_progress(self, options):
+        # progress_port=<port> serves the Prometheus metrics, progress=1 shows a status line
+        PROGRESS.add_queue("fetch", lambda: FETCHER.in_flight())
+        if FRONTIER is not None:
+            PROGRESS.add_queue("frontier", lambda: sum(total for (kind, state), total
+                in FRONTIER.counts().items() if state == "pending"))
+        PROGRESS.add_queue("zip", lambda: ZIP_ASSEMBLER.pending())
+        if TRANSCODER is not None:
+            PROGRESS.add_queue("transcode", lambda: TRANSCODER.pending())
+        if options.get('progress_port') is not None:
+            PROGRESS.serve(int(options['progress_port']))
+        if int(options.get('progress', '0')) == 1:
+            PROGRESS.show_status(interval=5 if sys.stderr.isatty() else 60)
+
+    def setup_profiler(self, options):
+        # profile=1 samples the crawl, scrape, html and video stages every
+        # profile_interval=<ms> and saves the profiles in PROFILES_DATA_DIR,
+        # the zips assembled by ZIP_ASSEMBLER are timed
+        if int(options.get('profile', '0')) == 1:
+            PROFILER.start(PROFILES_DATA_DIR,
+                interval=float(options.get('profile_interval', 10)) / 1000)
+
+    def setup_fetcher(self, options):
+        # engine=async downloads with aiohttp, concurrency=<n> requests in flight
+        global FETCHER
+        if options.get('engine', 'requests') == 'async':
+            get_session()
+            FETCHER = AsyncFetcher(get_session, concurrency=int(options.get('concurrency', 50)))
+            LOGGER.info("Async engine, concurrency: {}".format(FETCHER.concurrency))
+        # snapshot=record saves the responses in WARC files, snapshot=replay
+        # scrapes from them without network, so without the YouTube videos
+        global DOWNLOAD_VIDEOS
+        snapshot = options.get('snapshot', None)
+        snapshot_dir = options.get('snapshot_dir', SNAPSHOT_DIR)
+        if snapshot == 'record':
+            FETCHER = RecordingFetcher(FETCHER, snapshot_dir)
+        elif snapshot == 'replay':
+            FETCHER = ReplayFetcher(snapshot_dir)
+            DOWNLOAD_VIDEOS = False
+        elif snapshot is not None:
+            raise ValueError("Unknown snapshot mode: {}, choose record or replay".format(snapshot))
+
+    def download_css_js(self):
+        content = FETCHER.read("https://raw.githubusercontent.com/learningequality/html-app-starter/master/css/styles.css", cache=False)
+        with open("chefdata/styles.css", "wb") as f:
+            f.write(content)
+
+        content = FETCHER.read("https://raw.githubusercontent.com/learningequality/html-app-starter/master/js/scripts.js", cache=False)
+        with open("chefdata/scripts.js", "wb") as f:
+            f.write(content)
+
+    def crawl(self, args, options):
+        web_resource_tree = dict(
+            kind='TESSIndiaResourceTree',
+            title='TESSIndia',
+            children=[]
+        )
+        crawling_stage = os.path.join(TESSIndiaChef.TREES_DATA_DIR,                     
+                                    TESSIndiaChef.CRAWLING_STAGE_OUTPUT_TPL)
+        resource_browser = ResourceBrowser(BASE_URL)
+        for data in resource_browser.run(limit_page=None, page_number=1):
+            web_resource_tree["children"].append(data)
+        with open(crawling_stage, 'w') as f:
+            json.dump(web_resource_tree, f, indent=2)
+        return web_resource_tree
+
+    def is_partial_scrape(self, options):
+        return any(options.get(option) for option in ('state', 'subject', 'level', 'lesson'))
+
+    def scrape(self, args, options):
+        cache_tree = options.get('cache_tree', '1')
+        download_video = options.get('--download-video', "1")
+        # e.g. state="ଓଡ଼ିଶା" subject="English,Science" lesson=<url>,<url>
+        states = split_option(options.get('state'))
+        subjects = split_option(options.get('subject'))
+        levels = split_option(options.get('level'))
+        lesson_urls = set(normalize_url(url) for url in split_option(options.get('lesson')))
+
+        with open(self.crawling_stage, 'r') as f:
+            web_resource_tree = json.load(f)
+            assert web_resource_tree['kind'] == 'TESSIndiaResourceTree'
+         
+        if int(download_video) == 0:
+            global DOWNLOAD_VIDEOS
+            DOWNLOAD_VIDEOS = False
+
+        shard = self.get_shard(options)
+        if shard is not None:
+            web_resource_tree["children"] = list(shard_resources(web_resource_tree["children"],
+                shard[1], shard[0], shard_by=options.get('shard_by', 'state')))
+            LOGGER.info("Shard {} of {}: {} listings".format(shard[0], shard[1],
+                len(web_resource_tree["children"])))
+
+        if not self.is_partial_scrape(options):
+            return self._build_scraping_json_tree(cache_tree, web_resource_tree)
+
+        web_resource_tree["children"] = list(filter_resources(web_resource_tree["children"],
+            states=states, subjects=subjects, levels=levels))
+        LOGGER.info("Partial scrape of {} listings".format(len(web_resource_tree["children"])))
+        channel_tree = self._build_scraping_json_tree(cache_tree, web_resource_tree,
+            lesson_urls=lesson_urls, partial=True)
+        # ricecooker_json_tree.json is cleaned by clean_leafs_nodes_plus, its topics
+        # don't match the scraped ones, so only the scraped tree is spliced
+        scraped_stage = self.shard_stages(*shard)[0] if shard is not None else self.scraped_stage
+        if not if_file_exists(scraped_stage):
+            LOGGER.info("There is not a previous tree, only the partial scrape is saved")
+            return channel_tree
+        previous_tree = load_tree(scraped_stage)
+        splice_channel_tree(previous_tree, channel_tree)
+        return previous_tree
+
+    def write_tree_to_json(self, channel_tree, lang):
+        write_tree_to_json_tree(self.scrape_stage, to_dict(channel_tree))
+
+    def empty_channel_tree(self):
+        LANG = 'mul'
+        return dict(
+                source_domain=TESSIndiaChef.HOSTNAME,
+                source_id='tessindia',
+                title='TESSIndia',
+                description="""TESS-India is led by The Open University and Save The Children India, funded by UK Aid it is a multilingual teacher professional development programme whose aim is to support India’s national educational policy by enhancing the classroom practice of primary and secondary school teachers through the provision of freely available, adaptable Open Educational Resources (OER)."""[:400], #400 UPPER LIMIT characters allowed 
+                thumbnail=None,
+                language=LANG,
+                children=[],
+                license=TESSIndiaChef.LICENSE,
+            )
+
+    def get_resource(self, resource, lesson_urls=None):
+        return Resource(source_id=resource["url"],
+            lang=language_map(resource["state_lang"].strip()),
+            state=resource["state_lang"],
+            subject=resource["subject_name"],
+            level=resource["level_name"],
+            lesson_urls=lesson_urls)
+
+    def claim_listings(self, web_resource_tree):
+        FRONTIER.add_many([(resource["url"], resource)
+            for resource in web_resource_tree["children"]], "listing")
+        while True:
+            item = FRONTIER.claim(kinds=["listing"])
+            if item is None:
+                return
+            yield item["data"]
+
+    def _build_frontier_json_tree(self, web_resource_tree):
+        """
+        Build the channel tree with the listings scraped by all the workers of the frontier
+        """
+        global channel_tree
+        channel_tree = self.empty_channel_tree()
+        tree_index = LevelIndex(channel_tree)
+        results = FRONTIER.results("listing")
+        pending = 0
+        for resource in web_resource_tree["children"]:
+            nodes = results.get(resource["url"])
+            if nodes is None:
+                pending += 1
+                continue
+            resource = self.get_resource(resource)
+            resource.nodes = nodes
+            resource.to_tree(channel_tree, tree_index=tree_index)
+        if pending > 0:
+            LOGGER.info("{} listings are not scraped yet, the tree is incomplete".format(pending))
+        return channel_tree
+
+    def _build_scraping_json_tree(self, cache_tree, web_resource_tree, lesson_urls=None,
+            partial=False):
+        global channel_tree
+        channel_tree = self.empty_channel_tree()
+        tree_index = LevelIndex(channel_tree)
+        # the partial scrapes don't claim the listings, they scrape the filtered ones
+        # even if they are done, and save their results if the whole listing is scraped
+        use_frontier = FRONTIER is not None and not partial
+        save_results = FRONTIER is not None and not lesson_urls
+        if use_frontier:
+            listings = self.claim_listings(web_resource_tree)
+        else:
+            listings = web_resource_tree["children"]
+        counter = 0
+        types = set([])
+        total_size = len(web_resource_tree["children"])
+        copyrights = []
+        FETCHER.prefetch([resource["url"] for resource in web_resource_tree["children"]])
+        PROGRESS.discovered("listing", [resource["url"] for resource in web_resource_tree["children"]])
+        unfinished = []
+        for resource in listings:
+            if 0 <= counter <= total_size:
+                LOGGER.info("{} of {}".format(counter, total_size))
+                LOGGER.info("Resource: {}".format(resource["url"]))
+                resource = self.get_resource(resource, lesson_urls=lesson_urls)
+                with PROFILER.stage("scrape"), ZIP_ASSEMBLER.collect() as zips:
+                    resource.scrape()
+                PROGRESS.finished("listing", resource.source_id)
+                if save_results:
+                    unfinished.append((resource, zips))
+                    unfinished = self.finish_listings(unfinished)
+                if not lesson_urls or len(resource.nodes) > 0:
+                    resource.to_tree(channel_tree, tree_index=tree_index)
+            counter += 1
+        if save_results:
+            self.finish_listings(unfinished, wait=True)
+        if use_frontier:
+            return self._build_frontier_json_tree(web_resource_tree)
+        return channel_tree
+
+    def finish_listings(self, unfinished, wait=False):
+        """
+        Mark as done in the frontier the listings whose zips are assembled (all of them
+        if wait is True), the nodes of the zips that failed are not saved in the result.
+        The nodes of its lessons are saved as the results of the lessons.
+        Return the listings that are still waiting for its zips.
+        """
+        waiting = []
+        for resource, zips in unfinished:
+            if not wait and not all(future.done() for future in zips.values()):
+                waiting.append((resource, zips))
+                continue
+            failed = set([])
+            for filepath, future in zips.items():
+                try:
+                    future.result()
+                except Exception:
+                    failed.add(filepath)
+            nodes = to_dict(resource.nodes)
+            remove_files_nodes(dict(children=nodes), failed)
+            for lesson_node in nodes:
+                FRONTIER.done(normalize_url(lesson_node["source_id"]), "lesson", result=lesson_node)
+            FRONTIER.done(resource.source_id, "listing", result=nodes)
+        return waiting
+
@@ -0,0 +1,100 @@
+import logging
+import os
+import shutil
+import subprocess
+from utils import worker_pool
+
+
+LOGGER = logging.getLogger()
+
+#Target resolution and bitrates of the transcoded videos
+PROFILES = {
+    "low": dict(height=360, video_bitrate=300, audio_bitrate=48),
+    "medium": dict(height=480, video_bitrate=600, audio_bitrate=64),
+}
+
+
+def has_ffmpeg():
+    return shutil.which("ffmpeg") is not None
+
+
+def transcode(source, output, profile):
+    """
+    Re-encode the video with ffmpeg to h264/aac with the bitrates and the max
+    height of the profile, the output is only replaced when ffmpeg finishes
+    """
+    settings = PROFILES[profile]
+    tmp_output = "{}.tmp.mp4".format(output)
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-i", source,
+        "-vf", "scale=-2:'min({},ih)'".format(settings["height"]),
+        "-c:v", "libx264", "-preset", "slow",
+        "-b:v", "{}k".format(settings["video_bitrate"]),
+        "-maxrate", "{}k".format(settings["video_bitrate"]),
+        "-bufsize", "{}k".format(settings["video_bitrate"] * 2),
+        "-c:a", "aac", "-b:a", "{}k".format(settings["audio_bitrate"]),
+        "-movflags", "+faststart", tmp_output]
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise RuntimeError(e.stderr.decode("utf-8", "replace").strip())
+    os.replace(tmp_output, output)
+    return output
+
+
+class Transcoder(object):
+    """
+    Transcode the downloaded videos in a pool of processes, the outputs are saved
+    in cache_dir by video id and profile, so a video is transcoded only once.
+    """
+    def __init__(self, profile, cache_dir, max_workers=2):
+        if profile not in PROFILES:
+            raise ValueError("Unknown transcoding profile: {}, choose one of: {}".format(
+                profile, ", ".join(sorted(PROFILES))))
+        self.profile = profile
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.pool = None
+        self.jobs = {}
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def output_path(self, video_id):
+        return os.path.join(self.cache_dir, "{}_{}.mp4".format(video_id, self.profile))
+
+    def submit(self, source, video_id):
+        """
+        Schedule the transcoding of the source video and return the path of its output
+        """
+        output = self.output_path(video_id)
+        if output in self.jobs or os.path.exists(output):
+            return output
+        if self.pool is None:
+            self.pool = worker_pool(self.max_workers)
+        LOGGER.info("   - Transcoding: {} ({})".format(source, self.profile))
+        self.jobs[output] = (source, self.pool.submit(transcode, source, output, self.profile))
+        return output
+
+    def pending(self):
+        return sum(1 for _, future in self.jobs.values() if not future.done())
+
+    def wait(self):
+        """
+        Wait for the transcoding jobs and return a dict with the outputs that
+        failed mapped to its source videos
+        """
+        failed = {}
+        for output, (source, future) in self.jobs.items():
+            try:
+                future.result()
+            except Exception as e:
+                LOGGER.info("Transcoding error {}: {}".format(source, e))
+                failed[output] = source
+        self.jobs = {}
+        return failed
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
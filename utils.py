@@ -1,17 +1,40 @@
+from contextlib import contextmanager
 import json
 import os
 from pathlib import Path
 import ntpath
-from ricecooker.utils import downloader
+import re
+import time
+import zipfile
+import zlib
 import requests
-from ricecooker.utils.caching import CacheForeverHeuristic, FileCache, CacheControlAdapter
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 #from le_utils.constants import licenses, content_kinds, file_formats
 
 
 DATA_DIR = "chefdata"
+# the zip entries timestamp, the earliest date allowed by the zip format
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+TEXT_EXTENSIONS = (".html", ".css", ".js")
+# the blocks whose whitespace is meaningful are not minified
+HTML_RAW_BLOCKS_RE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+HTML_COMMENTS_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+HTML_TAG_RE = re.compile(r"<[A-Za-z][^<>]*>")
+HTML_REDUNDANT_ATTRS_RE = re.compile(
+    r'\s+(?:type="text/(?:javascript|css)"|language="javascript"|class=""|style=""|id="")', re.I)
+# the quoted strings are matched first, so the comments and spaces inside them are kept
+CSS_STRINGS_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", re.S)
+CSS_COMMENTS_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.S)
+CSS_SPACES_RE = re.compile(r"\s*([{};,>])\s*")
+# the modules with the functions run by the worker pools
+WORKER_POOL_MODULES = ["assemble", "transcode"]
 
 
 def save_thumbnail(url, save_as, sess):
+    from ricecooker.utils import downloader
     THUMB_DATA_DIR = build_path([DATA_DIR, 'thumbnail'])
     filepath = os.path.join(THUMB_DATA_DIR, save_as)
     try:
@@ -99,6 +122,32 @@ def get_level_map(tree, levels):
                 return children
 
 
+class LevelIndex(object):
+    """
+    Index of the topic nodes of a channel tree keyed by the source_ids of its path,
+    e.g (state,), (state, subject) and (state, subject, level)
+    """
+    def __init__(self, tree=None, depth=3):
+        self.index = {}
+        if tree is not None:
+            self.add_children(tree, (), depth)
+
+    def add_children(self, tree, path, depth):
+        if depth == 0:
+            return
+        for children in tree.get("children", []):
+            if "children" in children:
+                levels = path + (children["source_id"],)
+                self.index.setdefault(levels, children)
+                self.add_children(children, levels, depth - 1)
+
+    def add(self, levels, node):
+        self.index[tuple(levels)] = node
+
+    def get(self, levels):
+        return self.index.get(tuple(levels))
+
+
 def get_node_from_channel(source_id, channel_tree, exclude=None):
     parent = channel_tree["children"]
     while len(parent) > 0:
@@ -115,8 +164,205 @@ def get_node_from_channel(source_id, channel_tree, exclude=None):
         parent = nparent
 
 
+def minify_html(html):
+    """
+    Remove the comments, the redundant attributes of the tags and collapse the
+    whitespace of the html. The pre, textarea, script and style blocks are kept
+    as they are, except for the attributes of their opening tag.
+    """
+    parts = HTML_RAW_BLOCKS_RE.split(html)
+    minified = []
+    # split returns [text, block, tag name, text, block, tag name, ...]
+    for i in range(0, len(parts), 3):
+        text = HTML_COMMENTS_RE.sub("", parts[i])
+        text = HTML_TAG_RE.sub(remove_redundant_attrs, text)
+        minified.append(re.sub(r"\s+", " ", text))
+        if i + 1 < len(parts):
+            minified.append(HTML_TAG_RE.sub(remove_redundant_attrs, parts[i + 1], count=1))
+    return "".join(minified).strip()
+
+
+def remove_redundant_attrs(match):
+    return HTML_REDUNDANT_ATTRS_RE.sub("", match.group())
+
+
+def minify_css(css):
+    css = CSS_COMMENTS_RE.sub(lambda match: match.group(1) or "", css)
+    parts = CSS_STRINGS_RE.split(css)
+    # split returns [code, string, code, string, ...]
+    for i in range(0, len(parts), 2):
+        code = CSS_SPACES_RE.sub(r"\1", re.sub(r"\s+", " ", parts[i]))
+        parts[i] = code.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def deflated_size(content, compresslevel=6):
+    """
+    Size of the content deflated as a zip entry
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    return len(compressor.compress(content) + compressor.flush())
+
+
+def write_normalized_entry(zf, name, content, compresslevel=6, text_compresslevel=None):
+    """
+    Write the zip entry with a fixed timestamp, permissions and compression, the html,
+    css and js entries are compressed with text_compresslevel if it's set.
+    Return its compressed size if it's an html, css or js entry, 0 otherwise.
+    """
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    if name.endswith(TEXT_EXTENSIONS):
+        if text_compresslevel is None:
+            text_compresslevel = compresslevel
+        zf.writestr(info, content, compresslevel=text_compresslevel)
+        return info.compress_size
+    zf.writestr(info, content, compresslevel=compresslevel)
+    return 0
+
+
+def normalize_zip(filepath, compresslevel=6, text_compresslevel=None):
+    """
+    Rewrite the zip with its entries sorted by name, a fixed timestamp, permissions
+    and compression, so the same contents always give the same zip bytes.
+    The html, css and js entries are compressed with text_compresslevel if it's set.
+    Return the compressed size of the html, css and js entries.
+    """
+    with zipfile.ZipFile(filepath) as zf:
+        entries = {name: zf.read(name) for name in zf.namelist()}
+    text_size = 0
+    tmp_filepath = "{}.tmp".format(filepath)
+    try:
+        with zipfile.ZipFile(tmp_filepath, "w") as zf:
+            for name in sorted(entries):
+                text_size += write_normalized_entry(zf, name, entries[name],
+                    compresslevel=compresslevel, text_compresslevel=text_compresslevel)
+        os.replace(tmp_filepath, filepath)
+    finally:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+    return text_size
+
+
+def worker_pool(max_workers):
+    """
+    Process pool whose workers are forked from a fork server that has already
+    imported the WORKER_POOL_MODULES, so the workers start without importing them.
+    The fork server is started once for the whole run, so it preloads the modules
+    of every pool, and the functions run by the pools must be in those modules.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=max_workers)
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(WORKER_POOL_MODULES)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def split_option(value):
+    if not value:
+        return set([])
+    return set(item.strip() for item in value.split(",") if item.strip())
+
+
+def replace_files_paths(tree, paths):
+    """
+    Replace the paths of the files of the tree's nodes with the ones in the paths dict
+    """
+    for node in tree.get("children", []):
+        for file_ in node.get("files", []):
+            if file_.get("path") in paths:
+                file_["path"] = paths[file_["path"]]
+        replace_files_paths(node, paths)
+
+
+def remove_files_nodes(tree, paths):
+    """
+    Remove the nodes of the tree with a file whose path is in paths
+    """
+    children = tree.get("children", [])
+    children[:] = [node for node in children
+        if not any(file_.get("path") in paths for file_ in node.get("files", []))]
+    for node in children:
+        remove_files_nodes(node, paths)
+
+
+class FailureCache(object):
+    """
+    Urls that failed to download, saved in a json file with its failure class
+    and error. The permanent failures are skipped for `permanent_ttl` seconds
+    and the transient ones for `transient_ttl` seconds. Every change is merged
+    with the file under a lock, so the processes that share it don't lose the
+    failures saved by the others.
+    """
+    PERMANENT = "permanent"
+    TRANSIENT = "transient"
+
+    def __init__(self, path, permanent_ttl=30*24*3600, transient_ttl=24*3600):
+        self.path = path
+        self.ttl = {self.PERMANENT: permanent_ttl, self.TRANSIENT: transient_ttl}
+        self.failures = None
+
+    def read(self):
+        return load_tree(self.path) if if_file_exists(self.path) else {}
+
+    def load(self):
+        if self.failures is None:
+            self.failures = self.read()
+        return self.failures
+
+    @contextmanager
+    def locked(self):
+        build_path([os.path.dirname(self.path) or "."])
+        with open("{}.lock".format(self.path), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def write(self):
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self.failures, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def save(self, url, failure=None):
+        """
+        Set the failure of the url (or remove it if failure is None) in the failures
+        of the file and save them
+        """
+        with self.locked():
+            self.failures = self.read()
+            if failure is not None:
+                self.failures[url] = failure
+            elif self.failures.pop(url, None) is None:
+                return
+            self.write()
+
+    def get(self, url):
+        failure = self.load().get(url)
+        if failure is not None:
+            if time.time() - failure["failed_at"] < self.ttl[failure["failure"]]:
+                return failure
+
+    def add(self, url, failure, error=None):
+        self.save(url, dict(failure=failure, error=str(error), failed_at=time.time()))
+
+    def remove(self, url):
+        self.save(url)
+
+    def clear(self):
+        with self.locked():
+            self.failures = {}
+            self.write()
+
+
 def load_tree(path):
-    with open(path, 'r') as f:
+    with open(path, 'r', encoding='utf-8') as f:
         tree = json.load(f)
     return tree
     
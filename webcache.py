@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from cachecontrol.cache import BaseCache
+
+
+class BoundedCache(BaseCache):
+    """
+    Web cache for CacheControlAdapter with a size budget. The responses are saved
+    in files sharded by the hash of its key (ab/cd/abcd...) and indexed in a SQLite
+    database with its size and access time. When the cache is bigger than max_bytes
+    the least recently used entries are removed until it's under 90% of the budget,
+    the entries older than max_age seconds are removed too. The index and the atomic
+    file writes let several processes share the same cache.
+    """
+    INDEX_FILENAME = "index.sqlite3"
+
+    def __init__(self, directory, max_bytes=10*1024**3, max_age=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, self.INDEX_FILENAME),
+            timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            expires_at REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS total (size INTEGER NOT NULL)")
+        with self.transaction() as conn:
+            if conn.execute("SELECT COUNT(*) FROM total").fetchone()[0] == 0:
+                conn.execute("INSERT INTO total (size) VALUES (0)")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def path(self, key):
+        name = hashlib.sha224(key.encode("utf-8")).hexdigest()
+        return os.path.join(name[:2], name[2:4], name)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT path, created_at, expires_at FROM entries WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        path, created_at, expires_at = row
+        if (expires_at is not None and expires_at < now) or \
+                (self.max_age is not None and now - created_at > self.max_age):
+            self.delete(key)
+            return None
+        try:
+            with open(os.path.join(self.directory, path), "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            self.delete(key)
+            return None
+        with self.lock:
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def has(self, key):
+        """
+        Return True if the key has an entry that is not expired, without reading its file
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT created_at, expires_at FROM entries WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return False
+        created_at, expires_at = row
+        return (expires_at is None or expires_at >= now) and \
+            (self.max_age is None or now - created_at <= self.max_age)
+
+    def set(self, key, value, expires=None):
+        now = time.time()
+        if hasattr(expires, "timestamp"):
+            expires = expires.timestamp()
+        elif expires is not None:
+            expires = now + expires
+        path = self.path(key)
+        filepath = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_filepath = "{}.{}.tmp".format(filepath, os.getpid())
+        with open(tmp_filepath, "wb") as f:
+            f.write(value)
+        os.replace(tmp_filepath, filepath)
+        with self.transaction() as conn:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            previous_size = row[0] if row is not None else 0
+            conn.execute("""INSERT OR REPLACE INTO entries
+                (key, path, size, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, path, len(value), now, now, expires))
+            conn.execute("UPDATE total SET size = size + ?", (len(value) - previous_size,))
+            total = conn.execute("SELECT size FROM total").fetchone()[0]
+            if total > self.max_bytes:
+                self.evict(conn, total, keep=key)
+
+    def evict(self, conn, total, keep=None):
+        target = self.max_bytes * 0.9
+        removed = []
+        for key, path, size in conn.execute("SELECT key, path, size FROM entries ORDER BY accessed_at"):
+            if total <= target:
+                break
+            if key == keep:
+                continue
+            removed.append((key, path))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in removed])
+        conn.execute("UPDATE total SET size = ?", (total,))
+        for _, path in removed:
+            self.remove_file(path)
+
+    def remove_file(self, path):
+        try:
+            os.remove(os.path.join(self.directory, path))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT path, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("UPDATE total SET size = size - ?", (row[1],))
+        self.remove_file(row[0])
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self.conn.execute("SELECT size FROM total").fetchone()[0]
+        return dict(entries=entries, bytes=size, max_bytes=self.max_bytes)
+
+    def close(self):
+        self.conn.close()